@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def tasks_not_in_process(settings):
+    """Фоновые задачи core.tasks не уходят в пул потоков: иначе они
+    переживают тест вместе с его временным MEDIA_ROOT."""
+    settings.TASKS_RUN_IN_PROCESS = False
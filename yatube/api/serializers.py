@@ -0,0 +1,119 @@
+"""Сериализация записей и комментариев в словари для JSON.
+
+Объекты не создаются: выборка идет через values() с полями автора
+и группы из JOIN, и каждая строка перекладывается в словарь ответа.
+Клиент выбирает поля параметром ?fields=, и в SQL попадают только
+нужные колонки.
+"""
+from django.conf import settings
+
+AUTHOR_COLUMNS = {
+    'id': 'author_id',
+    'username': 'author__username',
+    'first_name': 'author__first_name',
+    'last_name': 'author__last_name',
+}
+GROUP_COLUMNS = {
+    'id': 'group_id',
+    'slug': 'group__slug',
+    'title': 'group__title',
+}
+POST_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'created': ('created',),
+    'image': ('image',),
+    'author': tuple(AUTHOR_COLUMNS.values()),
+    'group': tuple(GROUP_COLUMNS.values()),
+}
+COMMENT_FIELDS = {
+    'id': ('id',),
+    'text': ('text',),
+    'created': ('created',),
+    'author': tuple(AUTHOR_COLUMNS.values()),
+}
+# Колонки, без которых не посчитать курсор (created, id).
+CURSOR_COLUMNS = ('id', 'created')
+
+
+class ParamError(ValueError):
+    """Неверный параметр запроса; API отвечает на него 400."""
+
+
+def parse_fields(value, allowed):
+    """Поля из ?fields=id,text,author; без параметра - все."""
+    if not value:
+        return list(allowed)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ParamError(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown), ', '.join(allowed)
+            )
+        )
+    return fields
+
+
+def columns(fields, allowed):
+    """Колонки values() для выбранных полей и курсора."""
+    result = list(CURSOR_COLUMNS)
+    for name in fields:
+        result += [
+            column for column in allowed[name] if column not in result
+        ]
+    return result
+
+
+def _nested(row, mapping):
+    if row[mapping['id']] is None:
+        return None
+    return {key: row[column] for key, column in mapping.items()}
+
+
+def _image(name):
+    return f'{settings.MEDIA_URL}{name}' if name else None
+
+
+def post(row, fields):
+    result = {}
+    for name in fields:
+        if name == 'author':
+            result[name] = _nested(row, AUTHOR_COLUMNS)
+        elif name == 'group':
+            result[name] = _nested(row, GROUP_COLUMNS)
+        elif name == 'image':
+            result[name] = _image(row['image'])
+        else:
+            result[name] = row[name]
+    return result
+
+
+def comment(row, fields):
+    return {
+        name: (
+            _nested(row, AUTHOR_COLUMNS) if name == 'author' else row[name]
+        )
+        for name in fields
+    }
+
+
+def user(author, counters):
+    return {
+        'id': author.pk,
+        'username': author.username,
+        'first_name': author.first_name,
+        'last_name': author.last_name,
+        'posts_count': counters.posts_count,
+        'followers_count': counters.followers_count,
+        'following_count': counters.following_count,
+    }
+
+
+def group(instance):
+    return {
+        'id': instance.pk,
+        'slug': instance.slug,
+        'title': instance.title,
+        'description': instance.description,
+    }
@@ -0,0 +1,209 @@
+import tempfile
+
+from core import journal
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Запись {number}',
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(settings.POSTS_PER_PAGE + 3)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(
+                text=f'Комментарий {number}',
+                author=cls.reader,
+                post=cls.post,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feed_pages_by_cursor(self):
+        url = reverse('api:v1:post_list')
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), settings.POSTS_PER_PAGE)
+        self.assertIsNone(first['previous'])
+        self.assertEqual(first['results'][0]['id'], self.post.pk)
+        second = self.client.get(url, {'cursor': first['next']}).json()
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(
+            ids, sorted((post.pk for post in self.posts), reverse=True)
+        )
+
+    def test_embedded_objects_in_one_query(self):
+        """Автор и группа приходят вложенными без N+1."""
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('api:v1:post_list')).json()
+        row = data['results'][0]
+        self.assertEqual(
+            row['author'],
+            {
+                'id': self.author.pk,
+                'username': 'author',
+                'first_name': 'Лев',
+                'last_name': 'Толстой',
+            },
+        )
+        grouped = next(row for row in data['results'] if row['group'])
+        self.assertEqual(grouped['group']['slug'], 'group')
+        self.assertIsNone(
+            next(row for row in data['results'] if not row['group'])['group']
+        )
+
+    def test_sparse_fieldsets(self):
+        data = self.client.get(
+            reverse('api:v1:post_list'), {'fields': 'id,text'}
+        ).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        response = self.client.get(
+            reverse('api:v1:post_list'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_group_and_profile(self):
+        data = self.client.get(
+            reverse('api:v1:group_posts', args=['group'])
+        ).json()
+        self.assertEqual(data['group']['title'], 'Группа')
+        self.assertTrue(all(row['group'] for row in data['results']))
+        data = self.reader_client.get(
+            reverse('api:v1:profile', args=['author'])
+        ).json()
+        self.assertEqual(data['author']['posts_count'], len(self.posts))
+        self.assertFalse(data['author']['following'])
+        response = self.client.get(
+            reverse('api:v1:group_posts', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_post_detail_with_comments(self):
+        data = self.client.get(
+            reverse('api:v1:post_detail', args=[self.post.pk]),
+            {'fields': 'id,text', 'comment_fields': 'text,author'},
+        ).json()
+        self.assertEqual(
+            data['post'], {'id': self.post.pk, 'text': self.post.text}
+        )
+        self.assertEqual(
+            [row['text'] for row in data['comments']['results']],
+            ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'],
+        )
+        self.assertEqual(
+            data['comments']['results'][0]['author']['username'], 'reader'
+        )
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_post_comments_pages(self):
+        url = reverse('api:v1:post_comments', args=[self.post.pk])
+        first = self.client.get(url, {'fields': 'text'}).json()
+        self.assertEqual(
+            first['results'],
+            [{'text': 'Комментарий 2'}, {'text': 'Комментарий 1'}],
+        )
+        second = self.client.get(
+            url, {'fields': 'text', 'cursor': first['next']}
+        ).json()
+        self.assertEqual(second['results'], [{'text': 'Комментарий 0'}])
+        self.assertIsNone(second['next'])
+        response = self.client.get(
+            reverse('api:v1:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_follow_and_feed(self):
+        url = reverse('api:v1:follow', args=['author'])
+        self.assertEqual(self.client.post(url).status_code, 401)
+        response = self.reader_client.post(url)
+        self.assertEqual(response.json(), {'following': True})
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        data = self.reader_client.get(reverse('api:v1:follow_index')).json()
+        self.assertEqual(len(data['results']), settings.POSTS_PER_PAGE)
+        response = self.reader_client.delete(url)
+        self.assertEqual(response.json(), {'following': False})
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.reader_client.get(url).status_code, 405)
+
+    def test_csrf_failure_is_json(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        response = client.post(reverse('api:v1:follow', args=['author']))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('CSRF', response.json()['detail'])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_goes_through_journal(self):
+        """С журналом подписка через API видна читателю до сброса."""
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                WRITE_BEHIND=True,
+                WRITE_BEHIND_DIR=directory,
+                WRITE_BEHIND_INTERVAL=None,
+            ):
+                self.reader_client.post(
+                    reverse('api:v1:follow', args=['author'])
+                )
+                self.assertFalse(Follow.objects.exists())
+                data = self.reader_client.get(
+                    reverse('api:v1:profile', args=['author'])
+                ).json()
+                self.assertTrue(data['author']['following'])
+                journal.flush()
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+
+    def test_payload_smaller_than_html(self):
+        api = self.client.get(reverse('api:v1:post_list'))
+        html = self.client.get(reverse('posts:index'))
+        self.assertLess(len(api.content) * 3, len(html.content))
+
+    def test_changes_long_poll(self):
+        url = reverse('api:v1:changes')
+        current = self.client.get(url).json()
+        self.assertFalse(current['changed'])
+        response = self.client.get(
+            url, {'since': current['version'], 'timeout': 0}
+        )
+        self.assertFalse(response.json()['changed'])
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.client.get(
+            url, {'since': current['version'], 'timeout': 0}
+        )
+        self.assertTrue(response.json()['changed'])
+        response = self.client.get(url, {'scope': 'secret'})
+        self.assertEqual(response.status_code, 400)
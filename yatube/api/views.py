@@ -0,0 +1,236 @@
+import asyncio
+import re
+import time
+from functools import wraps
+
+from core import journal
+from core.asgi import async_variant, run_sync
+from core.paginator import CursorPaginator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from posts import counters, freshness, graph, timeline, writes
+from posts.models import Comment, Group, Post
+
+from . import serializers
+
+User = get_user_model()
+
+SCOPE_RE = re.compile(r'^(posts|(group|user|post):\d+)$')
+
+
+def _response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def _error(status, detail):
+    return _response({'detail': detail}, status=status)
+
+
+def endpoint(*methods, login=False):
+    """Проверяет метод и вход, ошибки отдает в JSON."""
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = _error(405, 'Метод не поддерживается.')
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            if login and not request.user.is_authenticated:
+                return _error(401, 'Нужно войти.')
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return _error(404, 'Не найдено.')
+            except serializers.ParamError as error:
+                return _error(400, str(error))
+        return wrapper
+    return decorator
+
+
+def _page(request, queryset, allowed, serialize, per_page, param='fields'):
+    """Страница по курсору (created, id) из строк values()."""
+    fields = serializers.parse_fields(request.GET.get(param), allowed)
+    rows = queryset.values(*serializers.columns(fields, allowed))
+    page = CursorPaginator(rows, per_page).get_page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(row, fields) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _posts(request, queryset):
+    return _page(
+        request,
+        queryset,
+        serializers.POST_FIELDS,
+        serializers.post,
+        settings.POSTS_PER_PAGE,
+    )
+
+
+def _comments(request, post_id, param):
+    return _page(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        serializers.COMMENT_FIELDS,
+        serializers.comment,
+        settings.COMMENTS_PER_PAGE,
+        param=param,
+    )
+
+
+@endpoint('GET')
+def post_list(request):
+    """Лента всех записей."""
+    return _response(_posts(request, Post.objects.all()))
+
+
+@endpoint('GET')
+def group_posts(request, slug):
+    """Записи группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return _response(
+        {
+            'group': serializers.group(group),
+            **_posts(request, Post.objects.filter(group=group)),
+        }
+    )
+
+
+@endpoint('GET')
+def profile(request, username):
+    """Автор, его счетчики и записи."""
+    author = get_object_or_404(User, username=username)
+    data = serializers.user(author, counters.for_user(author))
+    if request.user.is_authenticated:
+        data['following'] = writes.pending_following(
+            request.user.pk,
+            author.pk,
+            graph.is_following(request.user.pk, author.pk),
+        )
+    return _response(
+        {
+            'author': data,
+            **_posts(request, Post.objects.filter(author=author)),
+        }
+    )
+
+
+@endpoint('GET')
+def post_detail(request, post_id):
+    """Запись и страница ее комментариев.
+
+    Поля записи выбираются параметром fields, поля комментариев -
+    параметром comment_fields, cursor листает комментарии.
+    """
+    fields = serializers.parse_fields(
+        request.GET.get('fields'), serializers.POST_FIELDS
+    )
+    row = Post.objects.filter(pk=post_id).values(
+        *serializers.columns(fields, serializers.POST_FIELDS)
+    ).first()
+    if row is None:
+        raise Http404
+    return _response(
+        {
+            'post': serializers.post(row, fields),
+            'comments': _comments(request, post_id, 'comment_fields'),
+        }
+    )
+
+
+@endpoint('GET')
+def post_comments(request, post_id):
+    """Следующие страницы комментариев записи; поля - параметром fields."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return _response(_comments(request, post_id, 'fields'))
+
+
+@endpoint('GET', login=True)
+def follow_index(request):
+    """Лента подписок."""
+    return _response(_posts(request, timeline.feed_for(request.user)))
+
+
+@endpoint('POST', 'DELETE', login=True)
+def follow(request, username):
+    """POST подписывает на автора, DELETE отписывает.
+
+    Запись идет через журнал, как у страниц подписки.
+    """
+    author = get_object_or_404(User, username=username)
+    if author == request.user:
+        return _error(400, 'Нельзя подписаться на себя.')
+    operation = writes.follow if request.method == 'POST' else writes.unfollow
+    journal.submit(operation, request.user.pk, author_id=author.pk)
+    return _response({'following': request.method == 'POST'})
+
+
+def _changes_params(request):
+    """Область, известная клиенту версия и срок ожидания."""
+    scope = request.GET.get('scope', 'posts')
+    if not SCOPE_RE.match(scope):
+        raise serializers.ParamError(f'Неизвестная область: {scope}.')
+    try:
+        timeout = float(request.GET.get('timeout', settings.LONG_POLL_TIMEOUT))
+    except ValueError:
+        raise serializers.ParamError('timeout должен быть числом.')
+    timeout = min(max(timeout, 0), settings.LONG_POLL_TIMEOUT)
+    return scope, request.GET.get('since'), timeout
+
+
+def _changes_response(scope, since, version):
+    return _response(
+        {
+            'scope': scope,
+            'version': version,
+            'changed': since is not None and str(version) != since,
+        }
+    )
+
+
+async def changes_async(request):
+    """Асинхронный вариант changes: ждет без потока в цикле событий."""
+    try:
+        scope, since, timeout = _changes_params(request)
+    except serializers.ParamError as error:
+        return _error(400, str(error))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        version = (await run_sync(request, freshness.versions, [scope]))[0]
+        if since is None or str(version) != since or loop.time() >= deadline:
+            return _changes_response(scope, since, version)
+        await asyncio.sleep(settings.LONG_POLL_INTERVAL)
+
+
+@async_variant(changes_async)
+@endpoint('GET')
+def changes(request):
+    """Long-poll: ждет, пока версия области не отличится от since.
+
+    Без since сразу отдает текущую версию. Под WSGI запрос держит
+    поток все время ожидания, под ASGI выполняется changes_async.
+    """
+    scope, since, timeout = _changes_params(request)
+    deadline = time.monotonic() + timeout
+    while True:
+        version = freshness.versions([scope])[0]
+        if since is None or str(version) != since or (
+            time.monotonic() >= deadline
+        ):
+            return _changes_response(scope, since, version)
+        time.sleep(settings.LONG_POLL_INTERVAL)
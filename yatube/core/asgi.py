@@ -0,0 +1,309 @@
+"""ASGI-приложение поверх Django 2.2.
+
+Django 2.2 не умеет ASGI и асинхронные представления, поэтому
+AsgiHandler сам переводит HTTP-запрос ASGI в окружение WSGI.
+Обычные представления выполняются в ограниченном пуле потоков
+(ASGI_THREADS), как в многопоточном WSGI-сервере. Если у
+представления есть асинхронный вариант (@async_variant), GET-запрос
+к нему выполняется прямо в цикле событий и не держит поток, пока ждет
+кэш или хранилище. Асинхронный вариант получает HttpRequest без
+middleware; пользователя из сессии он загружает сам через load_user.
+Блокирующие вызовы асинхронный вариант делает через run_sync: они идут
+в тот же пул ASGI_THREADS, что и обычные представления.
+AsyncStreamingResponse отдает тело из асинхронного итератора, пока
+клиент не отключится, - так держатся соединения SSE без потоков.
+"""
+import asyncio
+import io
+import logging
+import sys
+from concurrent import futures
+from importlib import import_module
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.wsgi import WSGIHandler, WSGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponseServerError, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+
+def async_variant(async_view):
+    """Добавляет синхронному представлению асинхронный вариант для ASGI."""
+    def decorator(view):
+        view.asgi_view = async_view
+        return view
+    return decorator
+
+
+class AsyncStreamingResponse(StreamingHttpResponse):
+    """Потоковый ответ из асинхронного итератора; только для ASGI."""
+
+    def __init__(self, async_content, *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self.async_content = async_content
+
+
+async def run_sync(request, func, *args):
+    """Выполняет блокирующий вызов в пуле потоков обработчика ASGI."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        getattr(request, 'asgi_executor', None), func, *args
+    )
+
+
+def load_user(request):
+    """Заполняет request.session и request.user, как это делают
+    middleware; выполняется в пуле потоков."""
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    try:
+        request.user = get_user(request)
+    finally:
+        close_old_connections()
+    return request.user
+
+
+def _latin1(value):
+    return value.encode('utf-8').decode('latin-1')
+
+
+def build_environ(scope, body):
+    """Окружение WSGI для HTTP-запроса ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _headers(response):
+    headers = [
+        (name.encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in response.items()
+    ]
+    for cookie in response.cookies.values():
+        headers.append(
+            (b'Set-Cookie', cookie.output(header='').strip().encode())
+        )
+    return headers
+
+
+class AsgiHandler:
+    def __init__(self, wsgi_application, threads=None):
+        self.wsgi_application = wsgi_application
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Тип соединения не поддерживается: {scope}')
+        body = await self._read_body(receive)
+        async_view = self._async_view(scope)
+        if async_view is None:
+            await self._run_wsgi(scope, body, send)
+            return
+        request = WSGIRequest(build_environ(scope, body))
+        request.asgi_executor = self.executor
+        try:
+            response = await async_view(request)
+        except Exception:
+            logger.exception('Ошибка асинхронного представления')
+            response = HttpResponseServerError()
+        head = scope['method'] == 'HEAD'
+        if getattr(response, 'async_content', None) is not None:
+            await self._send_async_stream(response, receive, send, head)
+            return
+        await self._send_response(response, send, head)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    def _async_view(self, scope):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return None
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            return None
+        return getattr(match.func, 'asgi_view', None)
+
+    async def _send_response(self, response, send, head=False):
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': _headers(response),
+            }
+        )
+        try:
+            if head:
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            if not response.streaming:
+                await send(
+                    {'type': 'http.response.body', 'body': response.content}
+                )
+                return
+            for chunk in response.streaming_content:
+                await send(
+                    {
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    }
+                )
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            response.close()
+
+    async def _send_async_stream(self, response, receive, send, head=False):
+        """Шлет тело AsyncStreamingResponse до конца итератора или
+        до отключения клиента; на HEAD - только заголовки."""
+        async def stream():
+            await send(
+                {
+                    'type': 'http.response.start',
+                    'status': response.status_code,
+                    'headers': _headers(response),
+                }
+            )
+            if head:
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+            async for chunk in response.async_content:
+                await send(
+                    {
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    }
+                )
+            await send({'type': 'http.response.body', 'body': b''})
+
+        async def disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [
+            asyncio.ensure_future(stream()),
+            asyncio.ensure_future(disconnected()),
+        ]
+        try:
+            done, _ = await asyncio.wait(
+                tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            close = getattr(response.async_content, 'aclose', None)
+            if close is not None:
+                await close()
+            response.close()
+
+    async def _run_wsgi(self, scope, body, send):
+        """Выполняет Django WSGI в пуле потоков и шлет ответ кусками;
+        тело ответа на HEAD не отправляется, как у WSGI-серверов."""
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        result = await loop.run_in_executor(
+            self.executor,
+            self.wsgi_application,
+            build_environ(scope, body),
+            start_response,
+        )
+        chunks = iter(() if scope['method'] == 'HEAD' else result)
+        try:
+            await send(
+                {
+                    'type': 'http.response.start',
+                    'status': started['status'],
+                    'headers': started['headers'],
+                }
+            )
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.executor, next, chunks, None
+                )
+                if chunk is None:
+                    break
+                await send(
+                    {
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    }
+                )
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+
+def get_asgi_application():
+    """Точка входа ASGI, по аналогии с get_wsgi_application()."""
+    django.setup(set_prefix=False)
+    return AsgiHandler(WSGIHandler())
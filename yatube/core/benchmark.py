@@ -0,0 +1,192 @@
+"""Общие инструменты нагрузочных замеров.
+
+Здесь собраны процентили, прогон URL через тестовый клиент Django,
+подсчет запросов и строк, сохранение результатов в JSON и сравнение
+двух прогонов между собой.
+"""
+import itertools
+import json
+import math
+import platform
+import threading
+import time
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(samples, percent):
+    """Процентиль по методу ближайшего ранга."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    """Сводка задержек в миллисекундах."""
+    return {
+        'requests': len(samples),
+        'mean_ms': round(sum(samples) / len(samples), 3) if samples else 0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def _rows_returned(queries):
+    """Считает строки, которые вернули SELECT-запросы страницы."""
+    rows = 0
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            try:
+                cursor.execute(f'SELECT COUNT(*) FROM ({sql}) AS benchmark')
+            except Exception:
+                continue
+            rows += cursor.fetchone()[0]
+    return rows
+
+
+def profile_url(client, url):
+    """Считает запросы и строки, прочитанные одной загрузкой URL."""
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(url)
+    return {
+        'status': response.status_code,
+        'bytes': len(response.content),
+        'queries': len(captured),
+        'rows': _rows_returned(captured.captured_queries),
+    }
+
+
+def time_url(client, url, requests, warmup=0):
+    """Замеряет задержку URL в миллисекундах."""
+    for _ in range(warmup):
+        client.get(url)
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        client.get(url)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def run(targets, requests, warmup=0, user=None):
+    """Прогоняет набор URL и возвращает сводку по каждому."""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    results = {}
+    for name, url in targets.items():
+        samples = time_url(client, url, requests, warmup)
+        results[name] = {
+            'url': url,
+            **summarize(samples),
+            'rps': round(len(samples) / (sum(samples) / 1000), 2)
+            if samples else 0,
+            **profile_url(client, url),
+        }
+    return results
+
+
+class Writers:
+    """Потоки, которые пишут через представления, пока идет замер.
+
+    Каждый поток по кругу отправляет POST-запросы из writes и считает
+    успешные записи и ошибки (например, "database is locked").
+    """
+
+    def __init__(self, count, user, writes):
+        self.count = count
+        self.user = user
+        self.writes = writes
+        self.stats = {'writers': count, 'writes': 0, 'errors': 0}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _work(self):
+        client = Client()
+        client.force_login(self.user)
+        try:
+            for url, data in itertools.cycle(self.writes):
+                if self._stop.is_set():
+                    break
+                try:
+                    ok = client.post(url, data).status_code < 400
+                except Exception:
+                    ok = False
+                with self._lock:
+                    self.stats['writes' if ok else 'errors'] += 1
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        for _ in range(self.count):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        elapsed = time.perf_counter() - self.started
+        self.stats['writes_per_second'] = round(
+            self.stats['writes'] / elapsed, 2
+        ) if elapsed else 0
+
+
+def environment():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'journal_mode': _journal_mode(),
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+    }
+
+
+def _journal_mode():
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
+
+
+def save(path, payload):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(payload, output, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def compare(baseline, current, metric='p95_ms', threshold=1.2):
+    """Сравнивает прогоны и возвращает строки отчета и регрессии."""
+    lines, regressions = [], []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before or not before.get(metric):
+            continue
+        ratio = result[metric] / before[metric]
+        lines.append(
+            f'{name}: {metric} {before[metric]} -> {result[metric]} '
+            f'(x{ratio:.2f}), запросов {before["queries"]} -> '
+            f'{result["queries"]}'
+        )
+        if ratio > threshold or result['queries'] > before['queries']:
+            regressions.append(name)
+    return lines, regressions
@@ -0,0 +1,267 @@
+"""Кэш-бэкенды проекта.
+
+Все бэкенды считают попадания и промахи и защищают get_or_set от
+одновременного пересчета одного ключа (cache stampede): значение
+вычисляет только владелец короткой блокировки, остальные ждут его.
+RedisCache говорит на протоколе Redis (RESP) без сторонних библиотек,
+поэтому его можно проверить на core.fake_redis.
+"""
+import pickle
+import socket
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.cache.backends import filebased, locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+def cache_stats():
+    """Возвращает число попаданий и промахов кэша в этом процессе."""
+    with _stats_lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses']}
+
+
+def thread_cache_stats():
+    """Попадания и промахи кэша в текущем потоке."""
+    return {
+        'hits': getattr(_local, 'hits', 0),
+        'misses': getattr(_local, 'misses', 0),
+    }
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _record(hits=0, misses=0):
+    with _stats_lock:
+        _stats['hits'] += hits
+        _stats['misses'] += misses
+    _local.hits = getattr(_local, 'hits', 0) + hits
+    _local.misses = getattr(_local, 'misses', 0) + misses
+
+
+class InstrumentedCacheMixin:
+    """Метрики попаданий и защита от одновременного пересчета."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        options = args[-1].get('OPTIONS', {})
+        self.lock_timeout = options.get('STAMPEDE_LOCK_TIMEOUT', 5)
+        self.poll_interval = options.get('STAMPEDE_POLL_INTERVAL', 0.05)
+
+    def _raw_get(self, key, version=None):
+        return super().get(key, _MISSING, version=version)
+
+    def get(self, key, default=None, version=None):
+        value = self._raw_get(key, version=version)
+        if value is _MISSING:
+            _record(misses=1)
+            return default
+        _record(hits=1)
+        return value
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        lock_key = f'{key}:lock'
+        locked = self.add(lock_key, 1, self.lock_timeout, version=version)
+        if not locked:
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = self._raw_get(key, version=version)
+                if value is not _MISSING:
+                    return value
+        try:
+            value = default() if callable(default) else default
+            self.set(key, value, timeout, version=version)
+        finally:
+            if locked:
+                self.delete(lock_key, version=version)
+        return value
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    """Кэш в памяти процесса: для разработки и тестов."""
+
+
+class FileBasedCache(InstrumentedCacheMixin, filebased.FileBasedCache):
+    """Общий для всех воркеров кэш в каталоге на диске."""
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Минимальный клиент протокола RESP."""
+
+    def __init__(self, host, port, db, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.reader = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def execute(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self.sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Соединение с Redis закрыто')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f'Неизвестный ответ: {line!r}')
+
+
+class _RedisBackend(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlsplit(location)
+        self._host = url.hostname or '127.0.0.1'
+        self._port = url.port or 6379
+        self._db = int(url.path.strip('/') or 0)
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1
+        )
+        self._local = threading.local()
+
+    def _execute(self, *args):
+        connection = getattr(self._local, 'connection', None)
+        for attempt in range(2):
+            if connection is None:
+                connection = RedisConnection(
+                    self._host, self._port, self._db, self._socket_timeout
+                )
+                self._local.connection = connection
+            try:
+                return connection.execute(*args)
+            except OSError:
+                connection.close()
+                connection = self._local.connection = None
+                if attempt:
+                    raise
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        """Переводит таймаут Django в аргументы SET."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        return ['PX', max(int(timeout * 1000), 1)]
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(raw):
+        try:
+            return int(raw)
+        except ValueError:
+            return pickle.loads(raw)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == 0:
+            return False
+        reply = self._execute(
+            'SET', key, self._dump(value), *self._expiry(timeout), 'NX'
+        )
+        return reply == 'OK'
+
+    def get(self, key, default=None, version=None):
+        raw = self._execute('GET', self._key(key, version))
+        return default if raw is None else self._load(raw)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        if timeout == 0:
+            self._execute('DEL', key)
+            return
+        self._execute('SET', key, self._dump(value), *self._expiry(timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry:
+            return bool(self._execute('PEXPIRE', key, expiry[1]))
+        self._execute('PERSIST', key)
+        return bool(self._execute('EXISTS', key))
+
+    def delete(self, key, version=None):
+        self._execute('DEL', self._key(key, version))
+
+    def has_key(self, key, version=None):
+        return bool(self._execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        if not self._execute('EXISTS', key):
+            raise ValueError(f"Key '{key}' not found")
+        return self._execute('INCRBY', key, delta)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        raw_values = self._execute(
+            'MGET', *[self._key(key, version) for key in keys]
+        )
+        found = {
+            key: self._load(raw)
+            for key, raw in zip(keys, raw_values)
+            if raw is not None
+        }
+        _record(hits=len(found), misses=len(keys) - len(found))
+        return found
+
+    def clear(self):
+        self._execute('FLUSHDB')
+
+
+class RedisCache(InstrumentedCacheMixin, _RedisBackend):
+    """Общий для всех воркеров кэш на сервере Redis."""
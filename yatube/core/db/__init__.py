@@ -0,0 +1,19 @@
+"""Обслуживание соединений с базой данных.
+
+Django 2.2 держит постоянные соединения (CONN_MAX_AGE), но проверяет
+их только после ошибок. check_connections перед каждым запросом
+закрывает соединения, которые успела оборвать СУБД, если для базы
+включен CONN_HEALTH_CHECKS.
+"""
+from django.db import connections
+
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        if (
+            connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and connection.connection is not None
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
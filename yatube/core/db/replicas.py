@@ -0,0 +1,95 @@
+"""Чтение с реплик с гарантией read-your-writes.
+
+Записи всегда идут в default. Чтения уходят на случайную реплику из
+DATABASE_REPLICAS только внутри GET-запросов к представлениям из
+REPLICA_READ_VIEWS. Запрос, который что-то записал, ставит cookie,
+и следующие REPLICA_PIN_SECONDS секунд чтения этого клиента идут
+в default, чтобы он сразу видел свои изменения.
+"""
+import random
+import re
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'yatube_primary'
+WRITE_RE = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+_state = threading.local()
+
+
+def _track_writes(execute, sql, params, many, context):
+    if WRITE_RE.match(sql):
+        _state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def pinned():
+    """Текущий запрос закреплен за default после недавней записи."""
+    return getattr(_state, 'pinned', False)
+
+
+def reads_replica():
+    """Текущий запрос может прочитать данные с отстающей реплики."""
+    return (
+        bool(settings.DATABASE_REPLICAS)
+        and getattr(_state, 'allow_replica', False)
+        and not pinned()
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or not getattr(_state, 'allow_replica', False)
+            or getattr(_state, 'pinned', False)
+            or getattr(_state, 'wrote', False)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплик и закрепляет писавших за default."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.pinned = PIN_COOKIE in request.COOKIES
+        _state.allow_replica = False
+        _state.wrote = False
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(
+                _track_writes
+            ):
+                response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            _state.allow_replica = False
+            _state.pinned = _state.wrote = False
+        if wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.allow_replica = (
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name
+            in settings.REPLICA_READ_VIEWS
+        )
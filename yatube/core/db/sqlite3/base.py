@@ -0,0 +1,16 @@
+"""SQLite с настраиваемыми PRAGMA для одновременного чтения и записи.
+
+PRAGMA перечисляются в DATABASES[...]['OPTIONS']['pragmas'] и
+выполняются на каждом новом соединении.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn_params = dict(conn_params)
+        pragmas = conn_params.pop('pragmas', {})
+        conn = super().get_new_connection(conn_params)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
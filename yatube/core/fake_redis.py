@@ -0,0 +1,179 @@
+"""Локальная замена сервера Redis для разработки и тестов.
+
+Понимает протокол RESP и подмножество команд, которым пользуется
+core.cache.RedisCache. Запуск отдельным процессом:
+
+    python -m core.fake_redis 6379
+"""
+import socketserver
+import sys
+import threading
+import time
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, key):
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError):
+                return
+            if command is None:
+                return
+            name, args = command[0].upper().decode(), command[1:]
+            method = getattr(self, f'cmd_{name.lower()}', None)
+            try:
+                if method is None:
+                    raise ValueError(f"unknown command '{name}'")
+                reply = method(*args)
+            except (TypeError, ValueError) as error:
+                reply = error
+            self.wfile.write(self._encode(reply))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, Exception):
+            return b'-ERR %s\r\n' % str(reply).encode()
+        if isinstance(reply, str):
+            return b'+%s\r\n' % reply.encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, bytes):
+            return b'$%d\r\n%s\r\n' % (len(reply), reply)
+        return b'*%d\r\n' % len(reply) + b''.join(
+            self._encode(item) for item in reply
+        )
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        with self.store.lock:
+            return self.store.get(key)
+
+    def cmd_mget(self, *keys):
+        with self.store.lock:
+            return [self.store.get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        expires = None
+        for unit, scale in ((b'EX', 1), (b'PX', 0.001)):
+            if unit in options:
+                ttl = int(options[options.index(unit) + 1]) * scale
+                expires = time.monotonic() + ttl
+        with self.store.lock:
+            exists = self.store.get(key) is not None
+            if b'NX' in options and exists or b'XX' in options and not exists:
+                return None
+            self.store.data[key] = (value, expires)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        with self.store.lock:
+            return sum(
+                self.store.data.pop(key, None) is not None for key in keys
+            )
+
+    def cmd_exists(self, *keys):
+        with self.store.lock:
+            return sum(self.store.get(key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        with self.store.lock:
+            value = self.store.get(key) or b'0'
+            _, expires = self.store.data.get(key, (None, None))
+            value = int(value) + int(delta)
+            self.store.data[key] = (str(value).encode(), expires)
+        return value
+
+    def cmd_pexpire(self, key, milliseconds):
+        with self.store.lock:
+            value = self.store.get(key)
+            if value is None:
+                return 0
+            expires = time.monotonic() + int(milliseconds) / 1000
+            self.store.data[key] = (value, expires)
+        return 1
+
+    def cmd_persist(self, key):
+        with self.store.lock:
+            value = self.store.get(key)
+            if value is None:
+                return 0
+            self.store.data[key] = (value, None)
+        return 1
+
+    def cmd_flushdb(self):
+        with self.store.lock:
+            self.store.data.clear()
+        return 'OK'
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """Сервер в отдельном потоке; порт 0 выбирает свободный порт."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.store = _Store()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+    with FakeRedisServer(port=port) as server:
+        print(f'Fake Redis слушает {server.url}')
+        server.serve_forever()
@@ -0,0 +1,370 @@
+"""Отложенная запись (write-behind) через локальный журнал.
+
+Операция - функция с декоратором @operation. submit() выполняет ее
+сразу, а при WRITE_BEHIND дописывает строкой JSON в журнал процесса
+active-{pid}.jsonl в каталоге WRITE_BEHIND_DIR и возвращается, не
+трогая базу. Фоновый поток раз в WRITE_BEHIND_INTERVAL секунд или как
+только накопится WRITE_BEHIND_BATCH операций превращает журнал
+в сегмент и выполняет весь сегмент одной транзакцией, после чего
+удаляет файл. Так SQLite берет блокировку записи один раз на пачку,
+а не на каждую строку.
+
+Операции, которые еще не дошли до базы, лежат в кэше у их автора
+(pending), чтобы страницы могли показать ему его же запись; сигнал
+submitted дает приложениям сбросить кэши страниц с этой записью. Сегмент
+удаляется после коммита, поэтому при падении между коммитом и
+удалением пачка применится повторно. Чтобы операции не выполнились
+дважды, их id в той же транзакции пишутся в core.AppliedOperation,
+и при повторе такие операции пропускаются.
+Журналы упавших процессов подбирает команда flush_journal. Без
+WRITE_BEHIND_INTERVAL фоновый поток не запускается и журнал сбрасывает
+только flush().
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .metrics import format_value
+from .models import AppliedOperation
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'journal:pending:{user_id}'
+ACTIVE_PREFIX = 'active-'
+SEGMENT_SUFFIX = '.segment'
+
+COUNTERS = (
+    ('journaled', 'Операции, записанные в журнал'),
+    ('applied', 'Операции, выполненные из журнала'),
+    ('failed', 'Операции журнала, упавшие с ошибкой'),
+    ('skipped', 'Операции журнала, выполненные раньше'),
+    ('batches', 'Транзакции сброса журнала'),
+)
+
+# Операция записана в журнал; sender - функция операции.
+submitted = Signal(providing_args=['user_id', 'data'])
+
+_operations = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_pending_lock = threading.Lock()
+_totals = Counter()
+_wake = threading.Event()
+_journal = None
+_flusher = None
+
+
+def operation(name):
+    """Регистрирует функцию f(user_id, **data) как операцию журнала."""
+    def decorator(func):
+        func.operation_name = name
+        _operations[name] = func
+        return func
+    return decorator
+
+
+def _count(**values):
+    with _lock:
+        _totals.update(values)
+
+
+class Journal:
+    """Файл журнала одного процесса."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(
+            directory, f'{ACTIVE_PREFIX}{os.getpid()}.jsonl'
+        )
+        self.size = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """Дописывает операцию; возвращает число операций в файле."""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if settings.WRITE_BEHIND_FSYNC:
+                os.fsync(self._file.fileno())
+            self.size += 1
+            return self.size
+
+    def rotate(self):
+        """Закрывает файл и переименовывает его в сегмент для сброса."""
+        with self._lock:
+            if self._file is None:
+                return None
+            self._file.close()
+            self._file = None
+            self.size = 0
+            return _to_segment(self.path, os.getpid())
+
+
+def _to_segment(path, pid):
+    segment = os.path.join(
+        os.path.dirname(path), f'{time.time_ns()}-{pid}{SEGMENT_SUFFIX}'
+    )
+    os.replace(path, segment)
+    return segment
+
+
+def _get_journal():
+    global _journal
+    with _lock:
+        path = os.path.join(
+            settings.WRITE_BEHIND_DIR, f'{ACTIVE_PREFIX}{os.getpid()}.jsonl'
+        )
+        if _journal is None or _journal.path != path:
+            if _journal is not None:
+                _journal.rotate()
+            _journal = Journal(settings.WRITE_BEHIND_DIR)
+        return _journal
+
+
+def submit(func, user_id, **data):
+    """Выполняет операцию сразу или, при WRITE_BEHIND, через журнал."""
+    if not settings.WRITE_BEHIND:
+        return func(user_id, **data)
+    entry = {
+        'id': uuid.uuid4().hex,
+        'operation': func.operation_name,
+        'user_id': user_id,
+        'data': data,
+        'time': time.time(),
+    }
+    size = _get_journal().append(entry)
+    _count(journaled=1)
+    _remember(entry)
+    submitted.send(sender=func, user_id=user_id, data=data)
+    _start()
+    if size >= settings.WRITE_BEHIND_BATCH:
+        _wake.set()
+    return None
+
+
+def _remember(entry):
+    key = PENDING_KEY.format(user_id=entry['user_id'])
+    with _pending_lock:
+        entries = cache.get(key, [])
+        entries.append(entry)
+        cache.set(key, entries, settings.WRITE_BEHIND_PENDING_TIMEOUT)
+
+
+def _forget(entries):
+    ids = defaultdict(set)
+    for entry in entries:
+        ids[entry['user_id']].add(entry['id'])
+    for user_id, done in ids.items():
+        key = PENDING_KEY.format(user_id=user_id)
+        with _pending_lock:
+            left = [
+                entry
+                for entry in cache.get(key, [])
+                if entry['id'] not in done
+            ]
+            if left:
+                cache.set(key, left, settings.WRITE_BEHIND_PENDING_TIMEOUT)
+            else:
+                cache.delete(key)
+
+
+def pending(user_id, *funcs):
+    """Еще не сброшенные операции funcs пользователя в порядке записи.
+
+    У каждой есть operation, data - аргументы операции и time - время
+    записи.
+    """
+    names = {func.operation_name for func in funcs}
+    return [
+        entry
+        for entry in cache.get(PENDING_KEY.format(user_id=user_id), [])
+        if entry['operation'] in names
+    ]
+
+
+def _read(path):
+    entries = []
+    with open(path, encoding='utf-8') as segment:
+        for line in segment:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Оборванная строка: процесс упал посреди записи.
+                logger.warning('Пропущена битая строка журнала %s', path)
+    return entries
+
+
+def apply_segment(path):
+    """Выполняет операции сегмента одной транзакцией и удаляет его.
+
+    Каждая операция идет в своей точке сохранения, так что упавшая
+    операция пропускается, а не откатывает всю пачку.
+    """
+    entries = _read(path)
+    done = []
+    failed = skipped = 0
+    with transaction.atomic():
+        seen = _applied([entry['id'] for entry in entries])
+        for entry in entries:
+            if entry['id'] in seen:
+                skipped += 1
+                continue
+            func = _operations.get(entry['operation'])
+            try:
+                if func is None:
+                    raise LookupError(f'Неизвестная операция {entry}')
+                with transaction.atomic():
+                    func(entry['user_id'], **entry['data'])
+                done.append(AppliedOperation(id=entry['id']))
+            except Exception:
+                logger.exception('Операция журнала не выполнена: %s', entry)
+                failed += 1
+        AppliedOperation.objects.bulk_create(
+            done, batch_size=settings.WRITE_BEHIND_BATCH
+        )
+        AppliedOperation.objects.filter(
+            applied__lt=timezone.now() - timedelta(
+                seconds=settings.WRITE_BEHIND_APPLIED_TIMEOUT
+            )
+        ).delete()
+    os.remove(path)
+    _forget(entries)
+    _count(applied=len(done), failed=failed, skipped=skipped, batches=1)
+    return len(done)
+
+
+def _applied(ids):
+    """Те из ids, что уже выполнены прошлым сбросом."""
+    seen = set()
+    for start in range(0, len(ids), settings.WRITE_BEHIND_BATCH):
+        seen.update(
+            AppliedOperation.objects.filter(
+                pk__in=ids[start:start + settings.WRITE_BEHIND_BATCH]
+            ).values_list('pk', flat=True)
+        )
+    return seen
+
+
+def _pid(name):
+    """Процесс, которому принадлежит файл журнала или сегмент."""
+    if name.startswith(ACTIVE_PREFIX) and name.endswith('.jsonl'):
+        return int(name[len(ACTIVE_PREFIX):-len('.jsonl')])
+    if name.endswith(SEGMENT_SUFFIX):
+        return int(name[:-len(SEGMENT_SUFFIX)].split('-')[1])
+    return None
+
+
+def _files():
+    directory = settings.WRITE_BEHIND_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.listdir(directory))
+
+
+def _segments(pids):
+    return [
+        os.path.join(settings.WRITE_BEHIND_DIR, name)
+        for name in _files()
+        if name.endswith(SEGMENT_SUFFIX) and _pid(name) in pids
+    ]
+
+
+def flush():
+    """Сбрасывает журнал этого процесса; возвращает число операций."""
+    with _flush_lock:
+        _get_journal().rotate()
+        return sum(
+            apply_segment(path) for path in _segments({os.getpid()})
+        )
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover():
+    """Сбрасывает журналы и сегменты завершившихся процессов."""
+    with _flush_lock:
+        dead = set()
+        for name in _files():
+            pid = _pid(name)
+            if pid is None or _alive(pid):
+                continue
+            dead.add(pid)
+            if name.startswith(ACTIVE_PREFIX):
+                _to_segment(
+                    os.path.join(settings.WRITE_BEHIND_DIR, name), pid
+                )
+        return sum(apply_segment(path) for path in _segments(dead))
+
+
+def _run():
+    while True:
+        _wake.wait(settings.WRITE_BEHIND_INTERVAL or 1)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось сбросить журнал')
+        finally:
+            close_old_connections()
+
+
+def _start():
+    global _flusher
+    if settings.WRITE_BEHIND_INTERVAL is None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_run, name='journal', daemon=True
+            )
+            _flusher.start()
+            atexit.register(flush)
+
+
+def totals():
+    with _lock:
+        return Counter(_totals)
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+def render_prometheus():
+    """Счетчики журнала этого процесса."""
+    with _lock:
+        totals = Counter(_totals)
+    lines = []
+    for counter, description in COUNTERS:
+        lines.append(f'# HELP yatube_journal_{counter}_total {description}')
+        lines.append(f'# TYPE yatube_journal_{counter}_total counter')
+        lines.append(
+            f'yatube_journal_{counter}_total {format_value(totals[counter])}'
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,13 @@
+"""Отправка писем через очередь фоновых задач."""
+from django.core.mail import EmailMultiAlternatives
+
+from .tasks import task
+
+
+@task(queue='mail')
+def send_mail(subject, body, from_email, recipients, html=None):
+    """Отправляет письмо; html уходит альтернативной частью."""
+    message = EmailMultiAlternatives(subject, body, from_email, recipients)
+    if html is not None:
+        message.attach_alternative(html, 'text/html')
+    message.send()
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from concurrent import futures
+from urllib.parse import urlencode
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from core import benchmark
+from core.asgi import AsgiHandler, build_environ
+from posts import freshness
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность WSGI и ASGI на long-poll '
+        'запросах к /api/v1/changes/ при одинаковом числе потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=200,
+            help='Сколько клиентов одновременно ждут изменений.',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Потоков у WSGI-сервера и в пуле ASGI.',
+        )
+        parser.add_argument(
+            '--wait',
+            type=float,
+            default=1.0,
+            help='Сколько секунд каждый клиент ждет изменения.',
+        )
+        parser.add_argument(
+            '--output', help='Куда сохранить результаты в формате JSON.'
+        )
+
+    def handle(self, *args, **options):
+        version = freshness.versions(['posts'])[0]
+        query = urlencode(
+            {'scope': 'posts', 'since': version, 'timeout': options['wait']}
+        )
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('api:v1:changes'),
+            'query_string': query.encode(),
+            'headers': [],
+        }
+        results = {
+            'wsgi': self._wsgi(scope, options['clients'], options['threads']),
+            'asgi': asyncio.run(
+                self._asgi(scope, options['clients'], options['threads'])
+            ),
+        }
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["clients"]} клиентов за '
+                f'{result["seconds"]} с, {result["rps"]} запр/с, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
+        if options['output']:
+            benchmark.save(
+                options['output'],
+                {
+                    'environment': benchmark.environment(),
+                    'options': {
+                        key: options[key]
+                        for key in ('clients', 'threads', 'wait')
+                    },
+                    'servers': results,
+                },
+            )
+
+    def _summary(self, samples, errors, seconds):
+        return {
+            'clients': len(samples),
+            'seconds': round(seconds, 3),
+            'rps': round(len(samples) / seconds, 2),
+            'errors': errors,
+            **benchmark.summarize(samples),
+        }
+
+    def _wsgi(self, scope, clients, threads):
+        """Многопоточный WSGI-сервер: каждый клиент держит поток."""
+        handler = WSGIHandler()
+
+        def request(submitted):
+            statuses = []
+            result = handler(
+                build_environ(scope, b''),
+                lambda status, headers, exc_info=None: statuses.append(
+                    status
+                ),
+            )
+            b''.join(result)
+            result.close()
+            elapsed = (time.perf_counter() - submitted) * 1000
+            return elapsed, statuses[0].startswith('200')
+
+        # Задержка считается от постановки запроса, вместе с ожиданием
+        # свободного потока.
+        started = time.perf_counter()
+        with futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            done = [
+                future.result() for future in [
+                    pool.submit(request, time.perf_counter())
+                    for _ in range(clients)
+                ]
+            ]
+        seconds = time.perf_counter() - started
+        return self._summary(
+            [elapsed for elapsed, _ in done],
+            sum(not ok for _, ok in done),
+            seconds,
+        )
+
+    async def _asgi(self, scope, clients, threads):
+        """ASGI: ожидание идет в цикле событий, потоки не заняты."""
+        handler = AsgiHandler(WSGIHandler(), threads=threads)
+
+        async def request():
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                messages.append(message)
+
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            elapsed = (time.perf_counter() - started) * 1000
+            return elapsed, messages[0]['status'] == 200
+
+        started = time.perf_counter()
+        done = await asyncio.gather(*(request() for _ in range(clients)))
+        seconds = time.perf_counter() - started
+        handler.executor.shutdown()
+        return self._summary(
+            [elapsed for elapsed, _ in done],
+            sum(not ok for _, ok in done),
+            seconds,
+        )
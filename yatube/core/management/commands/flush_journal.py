@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import journal
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет журналы отложенной записи процессов, которые '
+        'завершились, не успев их сбросить.'
+    )
+
+    def handle(self, *args, **options):
+        applied = journal.recover()
+        self.stdout.write(f'Выполнено операций: {applied}')
@@ -0,0 +1,102 @@
+import time
+from concurrent import futures
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+from core.models import Task
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди с повторами '
+        'и ограничением числа одновременных задач в очереди.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue',
+            action='append',
+            help='Брать задачи только из этой очереди; можно повторять.',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=4,
+            help=(
+                'Сколько задач выполнять одновременно; при 1 задачи '
+                'выполняются в основном потоке.'
+            ),
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Пауза между опросами пустой очереди, с.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        before = tasks.totals()
+        pool = futures.ThreadPoolExecutor(
+            max_workers=options['concurrency'],
+            thread_name_prefix='run_tasks',
+        )
+        running = set()
+        try:
+            while True:
+                running = {future for future in running if not future.done()}
+                claimed = self._claim(
+                    options['queue'], options['concurrency'] - len(running)
+                )
+                for row in claimed:
+                    if options['concurrency'] > 1:
+                        running.add(pool.submit(self._execute, row))
+                    else:
+                        tasks.execute(row)
+                if claimed:
+                    continue
+                if options['once'] and not running:
+                    break
+                time.sleep(options['interval'] if not running else 0.05)
+        except KeyboardInterrupt:
+            self.stdout.write('Дожидаюсь начатых задач...')
+        finally:
+            pool.shutdown(wait=True)
+        done = tasks.totals() - before
+        self.stdout.write(
+            f'Выполнено: {done["succeeded"]}, '
+            f'отложено для повтора: {done["retried"]}, '
+            f'не выполнено: {done["failed"]}'
+        )
+
+    def _claim(self, queues, capacity):
+        """Берет готовые задачи в пределах свободных мест очередей."""
+        if capacity <= 0:
+            return []
+        released = tasks.release_stale()
+        if released:
+            self.stdout.write(f'Возвращено зависших задач: {released}')
+        claimed = []
+        worker = tasks.worker_name()
+        for queue, slots in tasks.free_slots().items():
+            if queues and queue not in queues:
+                continue
+            while slots and len(claimed) < capacity:
+                row = tasks.claim(Task.objects.filter(queue=queue), worker)
+                if row is None:
+                    break
+                claimed.append(row)
+                slots -= 1
+        return claimed
+
+    def _execute(self, row):
+        try:
+            tasks.execute(row)
+        finally:
+            close_old_connections()
@@ -0,0 +1,202 @@
+"""Метрики запросов к страницам.
+
+RequestMetricsMiddleware замеряет для каждого представления время
+ответа, число и время SQL-запросов, время отрисовки шаблонов и работу
+кэша. Повторы одного и того же SQL (N+1) пишутся в лог, цифры уходят
+в заголовок Server-Timing и копятся в процессе для страницы /metrics/
+в текстовом формате Prometheus. Доля замеряемых запросов задается
+REQUEST_METRICS['SAMPLE_RATE']. Страница /metrics/ открыта только
+с токеном REQUEST_METRICS['TOKEN'], без него она закрыта для всех.
+"""
+import hmac
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import thread_cache_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SAMPLE_RATE': 1.0,
+    'DUPLICATE_THRESHOLD': 3,
+    'SERVER_TIMING': True,
+    'BUCKETS': (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'TOKEN': '',
+}
+COUNTERS = (
+    ('requests', 'Замеренные запросы к страницам'),
+    ('db_queries', 'SQL-запросы'),
+    ('db_seconds', 'Время SQL-запросов, с'),
+    ('template_seconds', 'Время отрисовки шаблонов, с'),
+    ('cache_hits', 'Попадания в кэш'),
+    ('cache_misses', 'Промахи кэша'),
+    ('duplicate_queries', 'Повторные SQL-запросы (N+1)'),
+)
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = defaultdict(Counter)
+_histograms = defaultdict(Counter)
+
+
+def option(name):
+    return getattr(settings, 'REQUEST_METRICS', {}).get(name, DEFAULTS[name])
+
+
+def authorized(request):
+    """Проверяет заголовок Authorization: Bearer <TOKEN>."""
+    token = option('TOKEN')
+    if not token:
+        return False
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, value = header.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(
+        value.strip().encode(), token.encode()
+    )
+
+
+class RequestMetrics:
+    """Цифры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.cache_before = thread_cache_stats()
+        self.queries = Counter()
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries[sql] += 1
+
+    def finish(self):
+        cache_after = thread_cache_stats()
+        threshold = option('DUPLICATE_THRESHOLD')
+        self.duration = time.perf_counter() - self.started
+        self.cache_hits = cache_after['hits'] - self.cache_before['hits']
+        self.cache_misses = (
+            cache_after['misses'] - self.cache_before['misses']
+        )
+        self.duplicates = {
+            sql: count for sql, count in self.queries.items()
+            if count >= threshold
+        }
+        return self
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_seconds * 1000:.1f};'
+            f'desc="{sum(self.queries.values())} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits {self.cache_misses} misses"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ))
+
+
+def current():
+    """Метрики запроса, который обрабатывает текущий поток."""
+    return getattr(_local, 'metrics', None)
+
+
+def record(view, metrics):
+    duplicates = sum(metrics.duplicates.values())
+    with _lock:
+        totals = _totals[view]
+        totals['requests'] += 1
+        totals['db_queries'] += sum(metrics.queries.values())
+        totals['db_seconds'] += metrics.db_seconds
+        totals['template_seconds'] += metrics.template_seconds
+        totals['cache_hits'] += metrics.cache_hits
+        totals['cache_misses'] += metrics.cache_misses
+        totals['duplicate_queries'] += duplicates
+        totals['duration_seconds'] += metrics.duration
+        histogram = _histograms[view]
+        for bucket in option('BUCKETS'):
+            if metrics.duration <= bucket:
+                histogram[bucket] += 1
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+        _histograms.clear()
+
+
+def format_value(value):
+    return f'{value:.6f}'.rstrip('0').rstrip('.') if value else '0'
+
+
+def render_prometheus():
+    """Накопленные метрики в текстовом формате Prometheus."""
+    with _lock:
+        totals = {view: Counter(data) for view, data in _totals.items()}
+        histograms = {
+            view: Counter(data) for view, data in _histograms.items()
+        }
+    lines = []
+    for name, description in COUNTERS:
+        lines.append(f'# HELP yatube_{name}_total {description}')
+        lines.append(f'# TYPE yatube_{name}_total counter')
+        for view, data in sorted(totals.items()):
+            lines.append(
+                f'yatube_{name}_total{{view="{view}"}} '
+                f'{format_value(data[name])}'
+            )
+    name = 'yatube_request_duration_seconds'
+    lines.append(f'# HELP {name} Время ответа страницы, с')
+    lines.append(f'# TYPE {name} histogram')
+    for view, data in sorted(totals.items()):
+        for bucket in option('BUCKETS'):
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="{bucket}"}} '
+                f'{histograms[view][bucket]}'
+            )
+        lines.append(
+            f'{name}_bucket{{view="{view}",le="+Inf"}} {data["requests"]}'
+        )
+        lines.append(
+            f'{name}_sum{{view="{view}"}} '
+            f'{format_value(data["duration_seconds"])}'
+        )
+        lines.append(f'{name}_count{{view="{view}"}} {data["requests"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= option('SAMPLE_RATE'):
+            return self.get_response(request)
+        metrics = _local.metrics = RequestMetrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.finish()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        for sql, count in metrics.duplicates.items():
+            logger.warning(
+                'N+1 в %s: запрос выполнен %s раз: %s', view, count, sql
+            )
+        record(view, metrics)
+        if option('SERVER_TIMING'):
+            response['Server-Timing'] = metrics.server_timing()
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliedOperation',
+            fields=[
+                ('id', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Операция')),
+                ('applied', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Выполнена')),
+            ],
+            options={
+                'verbose_name': 'Выполненная операция журнала',
+                'verbose_name_plural': 'Выполненные операции журнала',
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreationDateModel(models.Model):
@@ -8,3 +9,61 @@ class CreationDateModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Task(CreationDateModel):
+    """Фоновая задача в очереди core.tasks."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    queue = models.CharField('Очередь', max_length=50, default='default')
+    payload = models.TextField('Аргументы в JSON')
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Попыток не больше', default=1
+    )
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_at = models.DateTimeField('Взята', blank=True, null=True)
+    locked_by = models.CharField('Исполнитель', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'queue', 'run_at'],
+                name='task_status_queue_run_at_idx',
+            ),
+        ]
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+
+class AppliedOperation(models.Model):
+    """Операция журнала core.journal, уже выполненная в базе.
+
+    Пишется в той же транзакции, что и сама операция, поэтому
+    повторный сброс сегмента после падения ее пропускает.
+    """
+
+    id = models.CharField('Операция', max_length=32, primary_key=True)
+    applied = models.DateTimeField(
+        'Выполнена', default=timezone.now, db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Выполненная операция журнала'
+        verbose_name_plural = 'Выполненные операции журнала'
@@ -0,0 +1,92 @@
+"""Кэш целых страниц с дырками под данные зрителя.
+
+Страница кэшируется одна на всех: все, что зависит от зрителя
+(шапка с именем, кнопка подписки, форма комментария), выводится тегом
+{% hole %} и при рендере для кэша заменяется меткой. При отдаче метки
+заполняются фрагментами, отрендеренными для текущего запроса, поэтому
+вошедшие пользователи тоже получают страницу из кэша.
+
+Клиент, закрепленный за default после записи, кэш не читает, чтобы
+увидеть свои изменения. Страница, прочитанная с реплики, может
+отставать, поэтому живет в кэше не дольше REPLICA_PIN_SECONDS.
+"""
+import base64
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from core.db import replicas
+
+HOLE = '<!--hole:{name}:{params}-->'
+HOLE_RE = re.compile(r'<!--hole:(\w+):([\w=-]*)-->')
+PAGE_KEY = 'page:{key}'
+
+_fragments = {}
+
+
+def fragment(name):
+    """Регистрирует функцию, которая рендерит фрагмент для запроса."""
+    def decorator(func):
+        _fragments[name] = func
+        return func
+    return decorator
+
+
+def render_fragment(request, name, params):
+    return _fragments[name](request, **params)
+
+
+def hole(request, name, params):
+    """Фрагмент или метка на его месте, если страница идет в кэш."""
+    if getattr(request, '_page_cache_holes', False):
+        raw = json.dumps(params, sort_keys=True).encode()
+        return HOLE.format(
+            name=name, params=base64.urlsafe_b64encode(raw).decode()
+        )
+    return render_fragment(request, name, params)
+
+
+def fill_holes(request, content):
+    def replace(match):
+        params = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return render_fragment(request, match.group(1), params)
+    return HOLE_RE.sub(replace, content)
+
+
+def cached_page(request, key, view, *args, **kwargs):
+    """Отдает страницу из кэша, заполняя дырки для текущего зрителя."""
+    if request.method not in ('GET', 'HEAD'):
+        return view(request, *args, **kwargs)
+    cache_key = PAGE_KEY.format(key=key)
+    entry = None if replicas.pinned() else cache.get(cache_key)
+    if entry is None:
+        request._page_cache_holes = True
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            request._page_cache_holes = False
+        if response.status_code != 200 or response.streaming:
+            return response
+        entry = (
+            response.content.decode(response.charset),
+            response['Content-Type'],
+        )
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if replicas.reads_replica():
+            timeout = min(timeout, settings.REPLICA_PIN_SECONDS)
+        cache.set(cache_key, entry, timeout)
+        response.content = fill_holes(request, entry[0])
+        return response
+    content, content_type = entry
+    return HttpResponse(
+        fill_holes(request, content), content_type=content_type
+    )
+
+
+@fragment('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
@@ -0,0 +1,272 @@
+import base64
+import hashlib
+import json
+import logging
+import time
+from concurrent import futures
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, obj):
+    """Упаковывает позицию (created, id) в непрозрачный токен.
+
+    obj - объект модели или строка values() с ключами created и id.
+    """
+    if isinstance(obj, dict):
+        created, pk = obj['created'], obj['id']
+    else:
+        created, pk = obj.created, obj.pk
+    raw = f'{direction}|{created.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора. Для битого токена возвращает None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, created, pk = raw.decode().split('|')
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or created is None:
+        return None
+    return direction, created, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, выбранная по курсору без COUNT и OFFSET."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (created, id).
+
+    Каждая страница читается одним запросом по индексу, поэтому время
+    ответа не зависит от глубины прокрутки ленты. Если у выборки есть
+    аннотации cursor_created и cursor_pk с теми же значениями, ключ
+    берется из них: так лента читается по индексу другой таблицы.
+    """
+
+    def _key(self):
+        if 'cursor_created' in self.object_list.query.annotations:
+            return 'cursor_created', 'cursor_pk'
+        return 'created', 'pk'
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor)
+        created_key, pk_key = self._key()
+        queryset = self.object_list.order_by(f'-{created_key}', f'-{pk_key}')
+        backwards = False
+        if position is not None:
+            direction, created, pk = position
+            lookup = 'lt' if direction == NEXT else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{created_key}__{lookup}': created})
+                | Q(**{created_key: created, f'{pk_key}__{lookup}': pk})
+            )
+            if direction == PREVIOUS:
+                backwards = True
+                queryset = queryset.order_by(created_key, pk_key)
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = position is not None, has_more
+        next_cursor = previous_cursor = None
+        if items:
+            if has_older:
+                next_cursor = encode_cursor(NEXT, items[-1])
+            if has_newer:
+                previous_cursor = encode_cursor(PREVIOUS, items[0])
+        return CursorPage(
+            items,
+            self,
+            cursor=cursor if position else None,
+            next_cursor=next_cursor,
+            previous_cursor=previous_cursor,
+        )
+
+
+_count_executor = None
+
+
+def _refresh_count(queryset, key):
+    """Точно пересчитывает размер выборки и кладет его в кэш."""
+    try:
+        timeout = settings.PAGINATOR_COUNT_TIMEOUT
+        cache.set(
+            key, (queryset.count(), time.time() + timeout), timeout * 12
+        )
+    except Exception:
+        logger.exception('Не удалось пересчитать %s', key)
+    finally:
+        cache.delete(f'{key}:refresh')
+        close_old_connections()
+
+
+def _submit_refresh(queryset, key):
+    global _count_executor
+    if _count_executor is None:
+        _count_executor = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='paginator-count'
+        )
+    _count_executor.submit(_refresh_count, queryset, key)
+
+
+class OpenEndedPage(Page):
+    """Страница выборки неизвестного размера: только соседние ссылки."""
+
+    is_open_ended = True
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def end_index(self):
+        return self.start_index() + len(self) - 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) на больших выборках.
+
+    Выборку до PAGINATOR_EXACT_COUNT_LIMIT строк считает ограниченным
+    запросом. Размер больших выборок берется из кэша, а точный подсчет
+    уходит в фон после коммита. Пока кэша нет, страница листается
+    только на соседние страницы; оценка планировщика PostgreSQL
+    (estimated_count) годится только для подписи, не для пагинации.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.exact_limit = settings.PAGINATOR_EXACT_COUNT_LIMIT
+
+    def _cache_key(self):
+        sql, params = self.object_list.query.sql_with_params()
+        raw = json.dumps([sql, params], default=str).encode()
+        return f'paginator_count:{hashlib.sha1(raw).hexdigest()}'
+
+    @cached_property
+    def estimated_count(self):
+        """Оценка числа строк от планировщика, пока точного нет."""
+        if self.count is not None:
+            return self.count
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.object_list.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def _schedule_refresh(self, key):
+        if cache.add(f'{key}:refresh', 1, settings.PAGINATOR_COUNT_TIMEOUT):
+            queryset = self.object_list.all()
+            transaction.on_commit(lambda: _submit_refresh(queryset, key))
+
+    @cached_property
+    def count(self):
+        """Число объектов; None, если его не удалось дешево узнать."""
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        key = self._cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            total, fresh_until = cached
+            if fresh_until < time.time():
+                self._schedule_refresh(key)
+            return total
+        queryset = self.object_list
+        if queryset.query.can_filter():
+            # Для подсчета порядок не нужен, а сортировка стоит дорого.
+            queryset = queryset.order_by()
+        total = queryset[:self.exact_limit + 1].count()
+        if total <= self.exact_limit:
+            return total
+        self._schedule_refresh(key)
+        return None
+
+    @cached_property
+    def num_pages(self):
+        if self.count is None:
+            return None
+        return super().num_pages
+
+    @property
+    def page_range(self):
+        if self.count is None:
+            return range(1, 1)
+        return super().page_range
+
+    def validate_number(self, number):
+        if self.count is not None:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        # Последняя страница неизвестна, поэтому номера меньше 1
+        # прижимаются к первой, а не к последней, как у Paginator.
+        return max(number, 1)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(1)
+
+    def page(self, number):
+        if self.count is not None:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not items and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return OpenEndedPage(
+            items[:self.per_page],
+            number,
+            self,
+            has_next=len(items) > self.per_page,
+        )
@@ -0,0 +1,236 @@
+"""Публикация и подписка на события.
+
+Подписка - это очередь сообщений с событием для синхронного ожидания
+и future для асинхронного, поэтому одно соединение SSE под ASGI
+стоит пару килобайт памяти и ни одного потока. LocalPubSub доставляет
+сообщения только внутри процесса. CachePubSub пишет их в общий кэш
+(file или redis), а один поток на процесс опрашивает кэш по каналам,
+на которые есть подписчики, и раздает сообщения местным подпискам.
+Бэкенд выбирается настройкой PUBSUB_BACKEND.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_KEY = 'pubsub:{channel}'
+MESSAGE_KEY = 'pubsub:{channel}:{sequence}'
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Subscription:
+    """Сообщения каналов, пришедшие с прошлого чтения."""
+
+    def __init__(self, pubsub, channels):
+        self.pubsub = pubsub
+        self.channels = frozenset(channels)
+        self._messages = deque(maxlen=settings.PUBSUB_BUFFER)
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._waiter = None
+
+    def put(self, message):
+        with self._lock:
+            self._messages.append(message)
+            self._event.set()
+            waiter = self._waiter
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _drain(self):
+        with self._lock:
+            messages = list(self._messages)
+            self._messages.clear()
+            self._event.clear()
+        return messages
+
+    def get(self, timeout=None):
+        """Ждет сообщений в потоке; по таймауту возвращает []."""
+        self._event.wait(timeout)
+        return self._drain()
+
+    async def aget(self, timeout=None):
+        """Ждет сообщений в цикле событий; по таймауту возвращает []."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._messages:
+                future = None
+            else:
+                self._waiter = (loop, future)
+        if future is not None:
+            try:
+                await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiter = None
+        return self._drain()
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalPubSub:
+    """Подписки в памяти одного процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channels):
+        with self._lock:
+            return self._add(channels)
+
+    def _add(self, channels):
+        """Регистрирует подписку; вызывается под self._lock."""
+        subscription = Subscription(self, channels)
+        for channel in subscription.channels:
+            self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def channels(self):
+        with self._lock:
+            return list(self._channels)
+
+    def subscribers(self):
+        with self._lock:
+            return len(set().union(*self._channels.values()))
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(message)
+
+
+class CachePubSub(LocalPubSub):
+    """Сообщения через общий кэш для нескольких процессов.
+
+    У канала в кэше есть счетчик сообщений и сами сообщения под
+    ключами с номерами; сообщения живут PUBSUB_MESSAGE_TIMEOUT секунд.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._seen = {}
+        self._poller = None
+
+    def publish(self, channel, message):
+        key = SEQUENCE_KEY.format(channel=channel)
+        cache.add(key, 0, None)
+        sequence = cache.incr(key)
+        cache.set(
+            MESSAGE_KEY.format(channel=channel, sequence=sequence),
+            message,
+            settings.PUBSUB_MESSAGE_TIMEOUT,
+        )
+
+    def subscribe(self, channels):
+        channels = set(channels)
+        with self._lock:
+            new = [
+                channel for channel in channels if channel not in self._seen
+            ]
+        sequences = cache.get_many(
+            [SEQUENCE_KEY.format(channel=channel) for channel in new]
+        )
+        # Номера и подписка регистрируются вместе, иначе poll успеет
+        # выбросить номер канала, на который еще никто не подписан.
+        with self._lock:
+            for channel in new:
+                self._seen.setdefault(
+                    channel,
+                    sequences.get(SEQUENCE_KEY.format(channel=channel), 0),
+                )
+            subscription = self._add(channels)
+        self._start()
+        return subscription
+
+    def _start(self):
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self._run, name='pubsub', daemon=True
+                )
+                self._poller.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Не удалось прочитать события из кэша')
+            time.sleep(settings.PUBSUB_POLL_INTERVAL)
+
+    def poll(self):
+        """Раздает подписчикам сообщения, появившиеся в кэше."""
+        with self._lock:
+            for channel in set(self._seen) - set(self._channels):
+                del self._seen[channel]
+            seen = dict(self._seen)
+        if not seen:
+            return
+        sequences = cache.get_many(
+            [SEQUENCE_KEY.format(channel=channel) for channel in seen]
+        )
+        last_sequences = {
+            channel: sequences.get(SEQUENCE_KEY.format(channel=channel), 0)
+            for channel in seen
+        }
+        with self._lock:
+            self._seen.update(last_sequences)
+        for channel, last in last_sequences.items():
+            if last <= seen[channel]:
+                continue
+            keys = [
+                MESSAGE_KEY.format(channel=channel, sequence=sequence)
+                for sequence in range(seen[channel] + 1, last + 1)
+            ]
+            messages = cache.get_many(keys)
+            for key in keys:
+                if key in messages:
+                    self._deliver(channel, messages[key])
+
+
+def get_backend():
+    """Общий на процесс экземпляр бэкенда из PUBSUB_BACKEND."""
+    path = settings.PUBSUB_BACKEND
+    with _backends_lock:
+        if path not in _backends:
+            _backends[path] = import_string(path)()
+        return _backends[path]
@@ -0,0 +1,63 @@
+"""Проверка планов SQL-запросов.
+
+explain() возвращает план запроса строками, problems() ищет в нем
+полный просмотр таблицы и сортировку во временной структуре.
+Поддерживаются SQLite (EXPLAIN QUERY PLAN) и PostgreSQL (EXPLAIN).
+"""
+import json
+import re
+
+from django.db import connection
+
+SQLITE_SCAN = re.compile(r'^SCAN (\S+)(.*)$')
+SQLITE_SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)')
+SQLITE_TEMP_SORT = 'USE TEMP B-TREE'
+POSTGRES_PROBLEMS = ('Seq Scan', 'Sort')
+
+
+def _postgres_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _postgres_nodes(child)
+
+
+def explain(sql, params=()):
+    """План запроса: список строк, по одной на шаг."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return [
+                ' '.join(
+                    str(node[key]) for key in (
+                        'Node Type', 'Relation Name', 'Index Name'
+                    ) if key in node
+                )
+                for node in _postgres_nodes(plan[0]['Plan'])
+            ]
+    return []
+
+
+def problems(plan):
+    """Шаги плана с полным просмотром таблицы или временной сортировкой."""
+    if connection.vendor == 'postgresql':
+        return [step for step in plan if step.startswith(POSTGRES_PROBLEMS)]
+    subqueries = {
+        match.group(1) for match in map(SQLITE_SUBQUERY.match, plan) if match
+    }
+    found = []
+    for step in plan:
+        scan = SQLITE_SCAN.match(step)
+        if step.startswith(SQLITE_TEMP_SORT) or (
+            scan
+            and scan.group(1) not in subqueries
+            and 'USING' not in scan.group(2)
+            and 'VIRTUAL TABLE' not in scan.group(2)
+        ):
+            found.append(step)
+    return found
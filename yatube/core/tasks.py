@@ -0,0 +1,265 @@
+"""Очередь фоновых задач без внешнего брокера.
+
+Задача - функция с декоратором @task. enqueue() сохраняет ее вызов
+строкой в таблицу core.Task, так что задача переживает перезапуск
+процесса. Выполняет задачи команда `manage.py run_tasks`; при
+TASKS_RUN_IN_PROCESS их сразу после коммита берет и пул потоков
+самого веб-процесса. Упавшая задача повторяется через
+TASK_RETRY_DELAY * 2**(попытка - 1) секунд, пока не кончатся попытки,
+и остается в таблице со статусом failed. Одновременно в очереди
+выполняется не больше задач, чем задано в TASK_QUEUES; задача,
+зависшая дольше TASK_LOCK_TIMEOUT, возвращается в очередь.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from concurrent import futures
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import format_value
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    ('enqueued', 'Поставленные в очередь задачи'),
+    ('succeeded', 'Выполненные задачи'),
+    ('retried', 'Отложенные для повтора задачи'),
+    ('failed', 'Задачи, у которых кончились попытки'),
+    ('seconds', 'Время выполнения задач, с'),
+)
+
+_tasks = {}
+_lock = threading.Lock()
+_totals = defaultdict(Counter)
+_executors = {}
+_pending = set()
+
+
+def task(queue='default', max_attempts=None):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи должны сериализоваться в JSON.
+    """
+    def decorator(func):
+        func.task_name = f'{func.__module__}.{func.__name__}'
+        func.task_queue = queue
+        func.task_max_attempts = max_attempts or settings.TASK_MAX_ATTEMPTS
+        _tasks[func.task_name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    if name not in _tasks:
+        import_string(name)
+    return _tasks[name]
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def _count(name, counter, value=1):
+    with _lock:
+        _totals[name][counter] += value
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит вызов func(*args, **kwargs) в очередь."""
+    row = Task.objects.create(
+        name=func.task_name,
+        queue=func.task_queue,
+        payload=json.dumps(
+            {'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder
+        ),
+        max_attempts=func.task_max_attempts,
+    )
+    _count(func.task_name, 'enqueued')
+    if settings.TASKS_RUN_IN_PROCESS:
+        transaction.on_commit(lambda: _submit(row.pk, row.queue))
+    return row
+
+
+def _executor(queue):
+    with _lock:
+        if queue not in _executors:
+            _executors[queue] = futures.ThreadPoolExecutor(
+                max_workers=limit(queue),
+                thread_name_prefix=f'tasks-{queue}',
+            )
+        return _executors[queue]
+
+
+def _submit(pk, queue, delay=0):
+    if delay:
+        timer = threading.Timer(delay, _submit, (pk, queue))
+        timer.daemon = True
+        timer.start()
+        return
+    future = _executor(queue).submit(_run_in_process, pk)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+
+
+def _run_in_process(pk):
+    try:
+        claimed = claim(Task.objects.filter(pk=pk), worker_name())
+        if claimed is not None:
+            delay = execute(claimed)
+            if delay is not None:
+                _submit(pk, claimed.queue, delay)
+    finally:
+        close_old_connections()
+
+
+def wait(timeout=None):
+    """Дожидается задач, которые выполняет пул веб-процесса."""
+    futures.wait(list(_pending), timeout)
+
+
+def limit(queue):
+    return settings.TASK_QUEUES.get(queue, settings.TASK_QUEUES['default'])
+
+
+def claim(queryset, worker):
+    """Забирает первую готовую задачу из выборки или возвращает None.
+
+    Задачу помечает running условный UPDATE, поэтому два исполнителя
+    не возьмут одну задачу и в SQLite, и в PostgreSQL.
+    """
+    now = timezone.now()
+    ready = queryset.filter(status=Task.QUEUED, run_at__lte=now).order_by(
+        'run_at', 'pk'
+    ).values_list('pk', flat=True)
+    for pk in ready[:10]:
+        taken = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_at=now,
+            locked_by=worker,
+        )
+        if taken:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def execute(row):
+    """Выполняет взятую задачу.
+
+    Возвращает задержку в секундах до повтора или None, если повтора
+    не будет.
+    """
+    started = time.perf_counter()
+    try:
+        func = get_task(row.name)
+        payload = json.loads(row.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        _count(row.name, 'seconds', time.perf_counter() - started)
+        return _fail(row, traceback.format_exc())
+    _count(row.name, 'seconds', time.perf_counter() - started)
+    _count(row.name, 'succeeded')
+    Task.objects.filter(pk=row.pk).delete()
+    return None
+
+
+def _fail(row, error):
+    if row.attempts >= row.max_attempts:
+        logger.error('Задача %s не выполнена:\n%s', row, error)
+        _count(row.name, 'failed')
+        Task.objects.filter(pk=row.pk).update(
+            status=Task.FAILED, locked_at=None, last_error=error
+        )
+        return None
+    delay = settings.TASK_RETRY_DELAY * 2 ** (row.attempts - 1)
+    logger.warning(
+        'Задача %s упала, повтор через %s с:\n%s', row, delay, error
+    )
+    _count(row.name, 'retried')
+    Task.objects.filter(pk=row.pk).update(
+        status=Task.QUEUED,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        locked_at=None,
+        locked_by='',
+        last_error=error,
+    )
+    return delay
+
+
+def release_stale():
+    """Возвращает в очередь задачи, чей исполнитель пропал."""
+    return Task.objects.filter(
+        status=Task.RUNNING,
+        locked_at__lt=timezone.now()
+        - timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+    ).update(status=Task.QUEUED, locked_at=None, locked_by='')
+
+
+def free_slots():
+    """Сколько задач каждой очереди можно взять сейчас."""
+    running = dict(
+        Task.objects.filter(status=Task.RUNNING)
+        .values_list('queue')
+        .annotate(Count('pk'))
+    )
+    queues = set(settings.TASK_QUEUES) | set(
+        Task.objects.filter(status=Task.QUEUED)
+        .values_list('queue', flat=True)
+        .distinct()
+    )
+    return {
+        queue: limit(queue) - running.get(queue, 0)
+        for queue in queues
+        if limit(queue) > running.get(queue, 0)
+    }
+
+
+def totals():
+    """Счетчики задач этого процесса, сложенные по всем задачам."""
+    with _lock:
+        return sum(_totals.values(), Counter())
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+
+
+def render_prometheus():
+    """Счетчики задач этого процесса и размер очередей из базы."""
+    with _lock:
+        totals = {name: Counter(data) for name, data in _totals.items()}
+    lines = []
+    for counter, description in COUNTERS:
+        lines.append(f'# HELP yatube_tasks_{counter}_total {description}')
+        lines.append(f'# TYPE yatube_tasks_{counter}_total counter')
+        for name, data in sorted(totals.items()):
+            lines.append(
+                f'yatube_tasks_{counter}_total{{task="{name}"}} '
+                f'{format_value(data[counter])}'
+            )
+    lines.append('# HELP yatube_tasks Задачи в таблице по состояниям')
+    lines.append('# TYPE yatube_tasks gauge')
+    rows = (
+        Task.objects.values_list('queue', 'status')
+        .annotate(Count('pk'))
+        .order_by('queue', 'status')
+    )
+    for queue, status, count in rows:
+        lines.append(
+            f'yatube_tasks{{queue="{queue}",status="{status}"}} {count}'
+        )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,35 @@
+"""Шаблонизатор Django, который замеряет время отрисовки для метрик."""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metrics
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        current = metrics.current()
+        if current is None:
+            return super().render(context, request)
+        current.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            current.template_depth -= 1
+            if not current.template_depth:
+                current.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Вложенные отрисовки учитываются один раз, во внешнем шаблоне."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            super().from_string(template_code).template, self
+        )
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(
+            super().get_template(template_name).template, self
+        )
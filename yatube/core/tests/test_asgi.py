@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from posts import freshness
+
+from ..asgi import AsgiHandler
+
+
+def _scope(path, query=b'', method='GET'):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': [(b'host', b'testserver')],
+    }
+
+
+def _call(handler, scope):
+    """Выполняет запрос ASGI и возвращает (статус, заголовки, тело)."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        await handler(scope, receive, send)
+
+    asyncio.run(run())
+    start, *body = messages
+    return (
+        start['status'],
+        dict(start['headers']),
+        b''.join(message.get('body', b'') for message in body),
+    )
+
+
+def _no_wsgi(environ, start_response):
+    raise AssertionError('запрос не должен идти в пул WSGI')
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AsgiHandlerTests(SimpleTestCase):
+    def test_regular_view_served_through_wsgi(self):
+        handler = AsgiHandler(WSGIHandler(), threads=1)
+        status, headers, body = _call(handler, _scope(reverse('about:tech')))
+        self.assertEqual(status, 200)
+        self.assertIn(b'text/html', headers[b'Content-Type'])
+        self.assertIn('Технологии'.encode(), body)
+
+    def test_async_variant_skips_thread_pool(self):
+        handler = AsgiHandler(_no_wsgi, threads=1)
+        status, _, body = _call(handler, _scope(reverse('api:v1:changes')))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['scope'], 'posts')
+
+    def test_head_sends_no_body(self):
+        for handler, path in (
+            (AsgiHandler(WSGIHandler(), threads=1), reverse('about:tech')),
+            (AsgiHandler(_no_wsgi, threads=1), reverse('api:v1:changes')),
+        ):
+            with self.subTest(path=path):
+                status, _, body = _call(
+                    handler, _scope(path, method='HEAD')
+                )
+                self.assertEqual(status, 200)
+                self.assertEqual(body, b'')
+
+    def test_async_variant_blocks_in_handler_pool(self):
+        """Блокирующие вызовы асинхронного варианта идут в пул
+        ASGI_THREADS, а не в пул цикла событий по умолчанию."""
+        handler = AsgiHandler(_no_wsgi, threads=1)
+        threads = []
+        versions = freshness.versions
+
+        def record(scopes):
+            threads.append(threading.current_thread().name)
+            return versions(scopes)
+
+        with mock.patch.object(freshness, 'versions', record):
+            _call(handler, _scope(reverse('api:v1:changes')))
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith('asgi') for name in threads))
+
+    @override_settings(LONG_POLL_INTERVAL=0.01)
+    def test_long_poll_wakes_on_change(self):
+        """Ожидающий клиент получает ответ, как только версия меняется."""
+        handler = AsgiHandler(_no_wsgi, threads=1)
+        version = freshness.versions(['posts'])[0]
+        scope = _scope(
+            reverse('api:v1:changes'),
+            f'since={version}&timeout=5'.encode(),
+        )
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            waiting = asyncio.ensure_future(handler(scope, receive, send))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiting.done())
+            freshness.touch('posts')
+            await asyncio.wait_for(waiting, 1)
+
+        asyncio.run(run())
+        self.assertTrue(json.loads(messages[1]['body'])['changed'])
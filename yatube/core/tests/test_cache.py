@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache import LocMemCache, RedisCache, cache_stats, reset_cache_stats
+from ..fake_redis import FakeRedisServer
+
+
+class RedisCacheTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeRedisServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = RedisCache(
+            self.server.url, {'KEY_PREFIX': 'test', 'VERSION': 1}
+        )
+        self.cache.clear()
+        reset_cache_stats()
+
+    def test_set_get_delete(self):
+        """Значения переживают путь через протокол Redis."""
+        self.cache.set('card', {'html': '<article>'})
+        self.assertEqual(self.cache.get('card'), {'html': '<article>'})
+        self.cache.delete('card')
+        self.assertIsNone(self.cache.get('card'))
+
+    def test_versions_are_separate(self):
+        """Ключи разных версий не пересекаются."""
+        self.cache.set('feed', 'старая', version=1)
+        self.cache.set('feed', 'новая', version=2)
+        self.assertEqual(self.cache.get('feed', version=1), 'старая')
+        self.assertEqual(self.cache.get('feed', version=2), 'новая')
+
+    def test_add_incr_and_timeout(self):
+        """add не перезаписывает ключ, incr атомарен, таймаут работает."""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.cache.set('short', 'x', timeout=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+
+    def test_hits_and_misses_counted(self):
+        """Попадания и промахи попадают в метрики."""
+        self.cache.set('a', 1)
+        self.cache.get('a')
+        self.cache.get('b')
+        self.cache.get_many(['a', 'b'])
+        self.assertEqual(cache_stats(), {'hits': 2, 'misses': 2})
+
+
+class StampedeProtectionTests(SimpleTestCase):
+    def test_value_computed_once(self):
+        """Одновременные промахи по ключу пересчитывают его один раз."""
+        cache = LocMemCache('stampede', {})
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'готово'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    cache.get_or_set('feed', expensive)
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['готово'] * 5)
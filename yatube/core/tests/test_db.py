@@ -0,0 +1,50 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from ..db import check_connections
+from ..db.sqlite3.base import DatabaseWrapper
+
+
+class SQLitePragmasTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        settings_dict = dict(connection.settings_dict)
+        settings_dict['NAME'] = os.path.join(directory, 'pragmas.sqlite3')
+        self.wrapper = DatabaseWrapper(settings_dict, alias='pragmas')
+        self.addCleanup(self._remove, settings_dict['NAME'])
+
+    def _remove(self, name):
+        self.wrapper.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(name + suffix):
+                os.remove(name + suffix)
+
+    def _pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_wal_and_busy_timeout(self):
+        """Новое соединение работает в WAL и ждет блокировку писателя."""
+        self.assertEqual(self._pragma('journal_mode'), 'wal')
+        self.assertEqual(self._pragma('busy_timeout'), 20000)
+        self.assertEqual(self._pragma('synchronous'), 1)
+
+
+class HealthCheckTests(SimpleTestCase):
+    def test_broken_connection_is_closed(self):
+        """Перед запросом оборванное соединение закрывается."""
+        fake = mock.Mock(
+            settings_dict={'CONN_HEALTH_CHECKS': True},
+            in_atomic_block=False,
+        )
+        fake.is_usable.return_value = False
+        with mock.patch('core.db.connections') as connections:
+            connections.all.return_value = [fake]
+            check_connections()
+        fake.close.assert_called_once_with()
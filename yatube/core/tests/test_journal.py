@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import journal
+from ..models import Task
+
+TEMP_DIR = tempfile.mkdtemp()
+DEAD_PID = 2 ** 22 + 1
+
+
+@journal.operation('test_create')
+def create(user_id, name):
+    if name == 'сломанная':
+        raise ValueError(name)
+    Task.objects.create(name=name)
+
+
+@override_settings(
+    WRITE_BEHIND=True, WRITE_BEHIND_DIR=TEMP_DIR, WRITE_BEHIND_INTERVAL=None
+)
+class JournalTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        journal.reset()
+        journal.flush()
+
+    @override_settings(WRITE_BEHIND=False)
+    def test_direct_mode_writes_at_once(self):
+        journal.submit(create, 1, name='сразу')
+        self.assertTrue(Task.objects.filter(name='сразу').exists())
+        self.assertEqual(os.listdir(TEMP_DIR), [])
+
+    def test_flush_applies_batch_in_one_transaction(self):
+        for number in range(3):
+            journal.submit(create, 1, name=f'задача {number}')
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(len(journal.pending(1, create)), 3)
+        with self.assertNumQueries(3 * 3 + 5):
+            self.assertEqual(journal.flush(), 3)
+        self.assertEqual(Task.objects.count(), 3)
+        self.assertEqual(journal.pending(1, create), [])
+        self.assertEqual(os.listdir(TEMP_DIR), [])
+        totals = journal.totals()
+        self.assertEqual((totals['applied'], totals['batches']), (3, 1))
+
+    def test_failed_operation_skipped(self):
+        journal.submit(create, 1, name='сломанная')
+        journal.submit(create, 1, name='целая')
+        with self.assertLogs('core.journal', 'ERROR'):
+            self.assertEqual(journal.flush(), 1)
+        self.assertEqual(
+            list(Task.objects.values_list('name', flat=True)), ['целая']
+        )
+        self.assertEqual(journal.totals()['failed'], 1)
+
+    def test_dead_process_journal_recovered(self):
+        """Журнал упавшего процесса, в том числе с оборванной последней
+        строкой, выполняет flush_journal."""
+        path = os.path.join(TEMP_DIR, f'active-{DEAD_PID}.jsonl')
+        entry = {
+            'id': 'a',
+            'operation': 'test_create',
+            'user_id': 1,
+            'data': {'name': 'из журнала'},
+            'time': 0,
+        }
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + '\n{"id": "b", "oper')
+        with self.assertLogs('core.journal', 'WARNING'):
+            self.assertEqual(journal.recover(), 1)
+        self.assertTrue(Task.objects.filter(name='из журнала').exists())
+        self.assertEqual(os.listdir(TEMP_DIR), [])
+
+    def test_replayed_segment_not_applied_twice(self):
+        """Сегмент, который снова сбрасывается после падения между
+        коммитом и удалением файла, не создает строки повторно."""
+        journal.submit(create, 1, name='однажды')
+        segment = journal._get_journal().rotate()
+        with open(segment, encoding='utf-8') as file:
+            content = file.read()
+        journal.apply_segment(segment)
+        with open(segment, 'w', encoding='utf-8') as file:
+            file.write(content)
+        self.assertEqual(journal.apply_segment(segment), 0)
+        self.assertEqual(Task.objects.filter(name='однажды').count(), 1)
+        self.assertEqual(journal.totals()['skipped'], 1)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+
+User = get_user_model()
+
+
+@override_settings(REQUEST_METRICS={'SERVER_TIMING': True, 'TOKEN': 'secret'})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_server_timing_header(self):
+        """Ответ несет время SQL, шаблонов и общее время страницы."""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(name, timing)
+
+    def test_prometheus_endpoint(self):
+        """Страница /metrics/ отдает накопленные цифры по представлениям."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('yatube_requests_total{view="posts:index"} 2', body)
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            body,
+        )
+
+    def test_prometheus_endpoint_needs_token(self):
+        """Без верного токена страница закрыта и для локальных адресов."""
+        for header in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1', **header
+                )
+                self.assertEqual(response.status_code, 403)
+
+    @override_settings(REQUEST_METRICS={})
+    def test_prometheus_endpoint_closed_without_token_setting(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer '
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(REQUEST_METRICS={'SAMPLE_RATE': 0})
+    def test_sampling_skips_requests(self):
+        """Запросы вне выборки не замеряются."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn('posts:index', metrics.render_prometheus())
+
+    def test_duplicate_queries_are_logged(self):
+        """Один и тот же SQL в цикле попадает в лог как N+1."""
+        users = [User.objects.create(username=f'user{i}') for i in range(3)]
+
+        def view(request):
+            for user in users:
+                User.objects.get(pk=user.pk)
+            return HttpResponse()
+
+        middleware = metrics.RequestMetricsMiddleware(view)
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+        self.assertIn('N+1', logs.output[0])
+        self.assertIn(
+            'yatube_duplicate_queries_total{view="unresolved"} 3',
+            metrics.render_prometheus(),
+        )
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..paginator import (
+    EstimatedCountPaginator,
+    OpenEndedPage,
+    _refresh_count,
+)
+
+User = get_user_model()
+
+
+@override_settings(PAGINATOR_EXACT_COUNT_LIMIT=5)
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {i}', author=author) for i in range(12)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post_set = Post.objects.all()
+
+    def test_small_set_counted_exactly(self):
+        """Выборка до лимита считается точно и дает обычную страницу."""
+        paginator = EstimatedCountPaginator(self.post_set[:4], 2)
+        page = paginator.get_page(2)
+        self.assertIs(type(page), Page)
+        self.assertEqual(paginator.count, 4)
+
+    def test_large_set_without_count_is_open_ended(self):
+        """Без кэша большая выборка листается только на соседние страницы."""
+        paginator = EstimatedCountPaginator(self.post_set, 5)
+        with self.assertNumQueries(2):
+            page = paginator.get_page(2)
+        self.assertIsInstance(page, OpenEndedPage)
+        self.assertIsNone(paginator.num_pages)
+        self.assertTrue(page.has_next())
+        self.assertTrue(page.has_previous())
+        last = paginator.get_page(3)
+        self.assertEqual(len(last), 2)
+        self.assertFalse(last.has_next())
+
+    def test_page_beyond_end_falls_back_to_first(self):
+        paginator = EstimatedCountPaginator(self.post_set, 5)
+        self.assertEqual(paginator.get_page(10).number, 1)
+
+    def test_page_below_one_falls_back_to_first(self):
+        paginator = EstimatedCountPaginator(self.post_set, 5)
+        for number in ('0', '-1'):
+            with self.subTest(number=number):
+                page = paginator.get_page(number)
+                self.assertIsInstance(page, OpenEndedPage)
+                self.assertEqual(page.number, 1)
+                response = self.client.get(
+                    reverse('posts:index'), {'page': number}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_cached_count_skips_counting(self):
+        """Пересчитанный в фоне размер читается из кэша без COUNT(*)."""
+        paginator = EstimatedCountPaginator(self.post_set, 5)
+        paginator.count
+        _refresh_count(self.post_set, paginator._cache_key())
+        paginator = EstimatedCountPaginator(self.post_set, 5)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(3)
+            self.assertEqual(len(page), 2)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertIs(type(page), Page)
+
+    def test_estimate_only_labels_open_ended_page(self):
+        """Оценка планировщика не превращается в число страниц."""
+        with mock.patch.object(
+            EstimatedCountPaginator, 'estimated_count', 100
+        ):
+            response = self.client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertIsInstance(page, OpenEndedPage)
+        self.assertIsNone(page.paginator.count)
+        self.assertContains(response, 'около 100 записей')
+        self.assertNotContains(response, 'Последняя')
+
+    def test_index_renders_without_last_link(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsInstance(response.context['page_obj'], OpenEndedPage)
+        self.assertNotContains(response, 'Последняя')
+        self.assertContains(response, 'Следующая')
@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from posts.models import Comment, Post
+
+from .. import query_plans
+
+
+class QueryPlansTests(TestCase):
+    def test_full_scan_and_temp_sort_found(self):
+        """Полный просмотр и временная сортировка считаются проблемами."""
+        queryset = Post.objects.filter(text__contains='запись')
+        queryset = queryset.order_by('text')
+        plan = query_plans.explain(*queryset.query.sql_with_params())
+        self.assertEqual(
+            query_plans.problems(plan),
+            ['SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'],
+        )
+
+    def test_feed_uses_index(self):
+        """Лента группы читается по составному индексу без сортировки."""
+        queryset = Post.objects.filter(group_id=1)[:10]
+        plan = query_plans.explain(*queryset.query.sql_with_params())
+        self.assertEqual(query_plans.problems(plan), [])
+        self.assertIn('post_group_created_idx', ' '.join(plan))
+
+    def test_comments_page_uses_index(self):
+        """Страница комментариев по курсору читается по индексу
+        (post, created, id) без сортировки."""
+        queryset = Comment.objects.filter(post_id=1).order_by(
+            '-created', '-pk'
+        )[:21]
+        plan = query_plans.explain(*queryset.query.sql_with_params())
+        self.assertEqual(query_plans.problems(plan), [])
+        self.assertIn('comment_post_created_idx', ' '.join(plan))
+
+    def test_subquery_scan_is_not_a_problem(self):
+        plan = ['CO-ROUTINE subquery', 'SCAN subquery']
+        self.assertEqual(query_plans.problems(plan), [])
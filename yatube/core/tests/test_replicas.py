@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..db.replicas import PIN_COOKIE
+
+User = get_user_model()
+
+REPLICA = 'replica_test'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_PIN_SECONDS=10)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Реплика - отдельный файл SQLite, в который ничего не копируется,
+    поэтому по содержимому страницы видно, из какой базы она прочитана.
+    """
+
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+            'TEST': {'NAME': os.path.join(cls.directory, 'replica.sqlite3')},
+        }
+        call_command('migrate', database=REPLICA, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(
+            text='Запись в primary', author=self.author
+        )
+
+    def test_feed_reads_from_replica(self):
+        """Лента читается с реплики, где записи еще нет."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Запись в primary')
+
+    def test_writer_reads_own_writes(self):
+        """После записи клиент читает из primary и видит свой комментарий."""
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Свежий комментарий'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_pin_expires(self):
+        """Без cookie закрепления чтения снова идут на реплику."""
+        self.client.cookies[PIN_COOKIE] = '1'
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Запись в primary')
+        del self.client.cookies[PIN_COOKIE]
+        cache.clear()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Запись в primary')
+
+    def test_other_views_read_primary(self):
+        """Представления вне REPLICA_READ_VIEWS читают из primary."""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:post_edit', args=[self.post.pk])
+        )
+        self.assertContains(response, 'Запись в primary')
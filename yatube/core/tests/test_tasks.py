@@ -0,0 +1,131 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Task
+
+User = get_user_model()
+
+calls = []
+
+
+@tasks.task()
+def remember(value):
+    calls.append(value)
+
+
+@tasks.task(max_attempts=2)
+def explode():
+    raise ValueError('сломалось')
+
+
+@tasks.task(queue='narrow')
+def narrow():
+    pass
+
+
+@override_settings(TASK_RETRY_DELAY=10, TASK_QUEUES={'default': 4})
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        tasks.reset()
+
+    def _run_next(self):
+        row = tasks.claim(Task.objects.all(), 'test')
+        return row, tasks.execute(row)
+
+    def test_task_runs_and_leaves_queue(self):
+        tasks.enqueue(remember, 'значение')
+        row, delay = self._run_next()
+        self.assertIsNone(delay)
+        self.assertEqual(calls, ['значение'])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(tasks.totals()['succeeded'], 1)
+
+    def test_failed_task_retried_with_backoff(self):
+        """Упавшая задача откладывается, а после последней попытки
+        остается в таблице со статусом failed."""
+        tasks.enqueue(explode)
+        row, delay = self._run_next()
+        self.assertEqual(delay, 10)
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.QUEUED)
+        self.assertGreater(row.run_at, timezone.now())
+        self.assertIn('сломалось', row.last_error)
+        self.assertIsNone(tasks.claim(Task.objects.all(), 'test'))
+        Task.objects.update(run_at=timezone.now())
+        row, delay = self._run_next()
+        self.assertIsNone(delay)
+        row.refresh_from_db()
+        self.assertEqual(row.status, Task.FAILED)
+        self.assertEqual(row.attempts, 2)
+        self.assertEqual(tasks.totals()['retried'], 1)
+        self.assertEqual(tasks.totals()['failed'], 1)
+
+    def test_task_claimed_once(self):
+        tasks.enqueue(remember, 1)
+        self.assertIsNotNone(tasks.claim(Task.objects.all(), 'first'))
+        self.assertIsNone(tasks.claim(Task.objects.all(), 'second'))
+
+    @override_settings(TASK_QUEUES={'default': 4, 'narrow': 1})
+    def test_queue_concurrency_limit(self):
+        tasks.enqueue(narrow)
+        tasks.enqueue(narrow)
+        self.assertEqual(tasks.free_slots()['narrow'], 1)
+        tasks.claim(Task.objects.filter(queue='narrow'), 'test')
+        self.assertNotIn('narrow', tasks.free_slots())
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_stale_task_released(self):
+        tasks.enqueue(remember, 1)
+        tasks.claim(Task.objects.all(), 'test')
+        Task.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(tasks.release_stale(), 1)
+        self.assertEqual(Task.objects.get().status, Task.QUEUED)
+
+    def test_run_tasks_command(self):
+        tasks.enqueue(remember, 1)
+        tasks.enqueue(remember, 2)
+        tasks.enqueue(explode)
+        out = StringIO()
+        call_command('run_tasks', once=True, concurrency=1, stdout=out)
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertIn('Выполнено: 2', out.getvalue())
+        self.assertIn('отложено для повтора: 1', out.getvalue())
+
+    @override_settings(REQUEST_METRICS={'TOKEN': 'secret'})
+    def test_metrics_include_queue(self):
+        tasks.enqueue(remember, 1)
+        body = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        self.assertIn(
+            'yatube_tasks_enqueued_total'
+            '{task="core.tests.test_tasks.remember"} 1',
+            body,
+        )
+        self.assertIn('yatube_tasks{queue="default",status="queued"} 1', body)
+
+    def test_password_reset_mail_sent_by_worker(self):
+        """Письмо сброса пароля не уходит из запроса, его шлет воркер."""
+        User.objects.create_user(
+            username='reader', email='reader@yatube.ru', password='secret'
+        )
+        response = self.client.post(
+            reverse('users:password_reset'), {'email': 'reader@yatube.ru'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(Task.objects.get().queue, 'mail')
+        call_command(
+            'run_tasks', once=True, concurrency=1, stdout=StringIO()
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@yatube.ru'])
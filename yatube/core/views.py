@@ -1,5 +1,10 @@
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+from . import journal, tasks
+
 
 def page_not_found(request, exception):
     """Обрабатывает страницу с ошибкой 404."""
@@ -17,5 +22,29 @@ def permission_denied(request, exception):
 
 
 def csrf_failure(request, reason=''):
-    """Обрабатывает страницу с ошибкой 403 и токеном csrf."""
+    """Обрабатывает страницу с ошибкой 403 и токеном csrf.
+
+    Клиентам API ошибка отдается в JSON, как остальные ошибки API.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and 'api' in match.namespaces:
+        return JsonResponse(
+            {'detail': 'Ошибка проверки CSRF.'},
+            status=403,
+            json_dumps_params={'ensure_ascii': False},
+        )
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Отдает метрики страниц, очереди задач и журнала записи
+    в текстовом формате Prometheus; нужен токен REQUEST_METRICS['TOKEN'].
+    """
+    if not request_metrics.authorized(request):
+        raise PermissionDenied
+    return HttpResponse(
+        request_metrics.render_prometheus()
+        + tasks.render_prometheus()
+        + journal.render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
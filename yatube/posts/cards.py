@@ -0,0 +1,56 @@
+"""Кэш отрендеренных карточек записей.
+
+Ключ карточки включает версии записи, ее автора и группы. Версии лежат
+в кэше и меняются при сохранении соответствующих объектов, так что
+правка текста, замена картинки или переименование автора сразу дают
+новую карточку во всех лентах.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+
+CARD_TEMPLATE = 'includes/post.html'
+VERSION_KEY = 'post_card_version:{kind}:{pk}'
+CARD_KEY = 'post_card:{pk}:{variant}:{versions}'
+
+
+def _version_key(kind, pk):
+    return VERSION_KEY.format(kind=kind, pk=pk)
+
+
+def invalidate(kind, *pks):
+    """Меняет версии объектов, от которых зависят карточки."""
+    now = time.time_ns()
+    cache.set_many({_version_key(kind, pk): now for pk in pks}, None)
+
+
+def _versions(post):
+    """Возвращает текущие версии записи, автора и группы."""
+    keys = [
+        _version_key('post', post.pk),
+        _version_key('author', post.author_id),
+        _version_key('group', post.group_id),
+    ]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def render_card(post, author=None, group=None):
+    """Возвращает HTML карточки записи, по возможности из кэша."""
+    variant = f'{int(bool(author))}{int(bool(group))}'
+    key = CARD_KEY.format(
+        pk=post.pk, variant=variant, versions=_versions(post)
+    )
+    return cache.get_or_set(
+        key,
+        lambda: get_template(CARD_TEMPLATE).render(
+            {'post': post, 'author': author, 'group': group}
+        ),
+        settings.POST_CARD_CACHE_TIMEOUT,
+    )
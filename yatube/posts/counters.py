@@ -0,0 +1,114 @@
+"""Денормализованные счетчики записей, подписок и комментариев.
+
+Строка счетчиков заводится сигналом вместе с пользователем или
+записью, дальше ее поддерживают атомарные инкременты из сигналов.
+Для данных, загруженных в обход сигналов, строки заводит
+create_missing. Чтение ничего не пишет в базу: без строки
+возвращаются нулевые несохраненные счетчики.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+
+from .models import Comment, Follow, Post, PostCounter, UserCounter
+
+User = get_user_model()
+
+
+def exact_user_counts(user_id):
+    """Считает счетчики пользователя по исходным таблицам."""
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def exact_post_counts(post_id):
+    """Считает счетчики записи по исходным таблицам."""
+    return {
+        'comments_count': Comment.objects.filter(post_id=post_id).count(),
+    }
+
+
+def for_user(user):
+    """Возвращает счетчики пользователя."""
+    return (
+        UserCounter.objects.filter(user_id=user.pk).order_by('user_id').first()
+        or UserCounter(user_id=user.pk)
+    )
+
+
+def for_post(post):
+    """Возвращает счетчики записи."""
+    return (
+        PostCounter.objects.filter(post_id=post.pk).order_by('post_id').first()
+        or PostCounter(post_id=post.pk)
+    )
+
+
+def start_user(user_id):
+    """Заводит счетчики нового пользователя."""
+    UserCounter.objects.get_or_create(
+        user_id=user_id, defaults=exact_user_counts(user_id)
+    )
+
+
+def start_post(post_id):
+    """Заводит счетчики новой записи."""
+    PostCounter.objects.get_or_create(
+        post_id=post_id, defaults=exact_post_counts(post_id)
+    )
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.values(field).annotate(total=Count('id'))
+        .values_list(field, 'total')
+    )
+
+
+def create_missing():
+    """Заводит недостающие строки счетчиков по точным COUNT одним
+    запросом на счетчик; нужно после загрузок пачками."""
+    posts = _grouped(Post.objects.all(), 'author_id')
+    followers = _grouped(Follow.objects.all(), 'author_id')
+    following = _grouped(Follow.objects.all(), 'user_id')
+    UserCounter.objects.bulk_create(
+        [
+            UserCounter(
+                user_id=pk,
+                posts_count=posts.get(pk, 0),
+                followers_count=followers.get(pk, 0),
+                following_count=following.get(pk, 0),
+            )
+            for pk in User.objects.filter(counters__isnull=True)
+            .values_list('pk', flat=True)
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    comments = _grouped(Comment.objects.all(), 'post_id')
+    PostCounter.objects.bulk_create(
+        [
+            PostCounter(post_id=pk, comments_count=comments.get(pk, 0))
+            for pk in Post.objects.filter(counters__isnull=True)
+            .values_list('pk', flat=True)
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def change_user(user_id, **deltas):
+    """Сдвигает счетчики пользователя, если они уже заведены."""
+    UserCounter.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def change_post(post_id, **deltas):
+    """Сдвигает счетчики записи, если они уже заведены."""
+    PostCounter.objects.filter(post_id=post_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
@@ -0,0 +1,72 @@
+"""Части страниц, которые зависят от зрителя и дорисовываются
+поверх закэшированной страницы (см. core.page_cache).
+"""
+from django.template.loader import render_to_string
+
+from core.page_cache import fragment
+
+from . import graph, writes
+from .forms import CommentForm
+
+
+@fragment('switcher')
+def switcher(request, active):
+    return render_to_string(
+        'posts/includes/switcher.html',
+        {'index': active == 'index', 'follow': active == 'follow'},
+        request=request,
+    )
+
+
+@fragment('follow_button')
+def follow_button(request, author_id, username):
+    if not request.user.is_authenticated or request.user.pk == author_id:
+        return ''
+    # Все кнопки страницы проверяются по одному массиву подписок.
+    if not hasattr(request, '_following_ids'):
+        request._following_ids = graph.following_ids(request.user.pk)
+    following = writes.pending_following(
+        request.user.pk,
+        author_id,
+        graph.contains(request._following_ids, author_id),
+    )
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'username': username, 'following': following},
+        request=request,
+    )
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'includes/comments.html',
+        {'post_id': post_id, 'form': CommentForm()},
+        request=request,
+    )
+
+
+@fragment('pending_comments')
+def pending_comments(request, post_id):
+    """Комментарии зрителя, которые еще ждут в журнале записи."""
+    if not request.user.is_authenticated:
+        return ''
+    comments = writes.pending_comments(request.user, post_id)
+    if not comments:
+        return ''
+    return render_to_string(
+        'posts/includes/comment_list.html',
+        {'comments': comments, 'post_id': post_id},
+        request=request,
+    )
+
+
+@fragment('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if request.user.pk != author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/post_edit_link.html', {'post_id': post_id}
+    )
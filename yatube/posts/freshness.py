@@ -0,0 +1,130 @@
+"""Условные ответы для лент и страницы записи.
+
+Страница зависит от нескольких областей: всех записей ('posts'),
+группы, пользователя или записи. Версии областей лежат в кэше и
+меняются сигналами при каждой правке. ETag собирается из версий,
+зрителя и адреса страницы, поэтому 304 отдается без рендера шаблона.
+Из тех же версий и адреса, но без зрителя, собирается ключ кэша
+целой страницы (core.page_cache).
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core import page_cache
+
+VERSION_KEY = 'freshness:{scope}'
+
+
+def touch(*scopes):
+    """Меняет версии областей после правки."""
+    now = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(scope=scope): now for scope in scopes}, None
+    )
+
+
+def versions(scopes):
+    keys = [VERSION_KEY.format(scope=scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def etag(request, scopes):
+    viewer = ''
+    if request.user.is_authenticated:
+        viewer = '{}:{}'.format(
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        )
+    raw = '|'.join(
+        [str(version) for version in versions(scopes)]
+        + [viewer, request.get_full_path()]
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def page_key(request, scopes):
+    """Ключ страницы в кэше: одинаков для всех зрителей."""
+    raw = '|'.join(
+        [str(version) for version in versions(scopes)]
+        + [request.get_full_path()]
+    )
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def last_modified(request, scopes):
+    """Время последней правки; только для анонимов, страница которых
+    одинакова для всех.
+    """
+    if request.user.is_authenticated:
+        return None
+    return datetime.fromtimestamp(
+        max(versions(scopes)) / 10**9, tz=timezone.utc
+    )
+
+
+def _cache_control(request, response):
+    max_age = settings.HTTP_CACHE_MAX_AGE.get(request.resolver_match.url_name)
+    if max_age is None:
+        return
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    patch_vary_headers(response, ('Cookie',))
+
+
+def conditional_page(get_scopes):
+    """Отвечает 304, если области страницы не менялись, иначе отдает
+    страницу из кэша.
+
+    get_scopes получает аргументы представления и возвращает список
+    областей или None, если объекта нет и условный ответ не нужен.
+    """
+    def scopes(request, kwargs):
+        if not hasattr(request, '_freshness_scopes'):
+            request._freshness_scopes = get_scopes(**kwargs)
+        return request._freshness_scopes
+
+    def etag_func(request, *args, **kwargs):
+        found = scopes(request, kwargs)
+        return None if found is None else etag(request, found)
+
+    def last_modified_func(request, *args, **kwargs):
+        found = scopes(request, kwargs)
+        return None if found is None else last_modified(request, found)
+
+    def decorator(view):
+        def cached_view(request, *args, **kwargs):
+            found = scopes(request, kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            return page_cache.cached_page(
+                request, page_key(request, found), view, *args, **kwargs
+            )
+
+        conditional_view = condition(etag_func, last_modified_func)(
+            cached_view
+        )
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and (
+                response.status_code in (200, 304)
+            ):
+                _cache_control(request, response)
+            return response
+        return wrapper
+    return decorator
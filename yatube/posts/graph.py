@@ -0,0 +1,111 @@
+"""Граф подписок в кэше.
+
+Для каждого пользователя в кэше лежат два отсортированных массива id:
+на кого он подписан и кто подписан на него. Массив хранится байтами
+array('I'), поэтому тысяча подписок занимает 4 КБ, а проверка одной
+подписки - двоичный поиск без запроса к базе. Сигналы Follow
+сбрасывают массивы обоих участников.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+FOLLOWING_KEY = 'graph:following:{pk}'
+FOLLOWERS_KEY = 'graph:followers:{pk}'
+
+
+def _load(key_template, field, other, user_ids):
+    """Массивы для user_ids: из кэша, недостающие одним запросом."""
+    keys = {key_template.format(pk=pk): pk for pk in user_ids}
+    found = cache.get_many(keys)
+    result = {
+        keys[key]: array('I', value) for key, value in found.items()
+    }
+    missing = [pk for key, pk in keys.items() if key not in found]
+    if missing:
+        loaded = {pk: array('I') for pk in missing}
+        rows = Follow.objects.filter(
+            **{f'{field}__in': missing, f'{other}__isnull': False}
+        ).order_by(field, other).values_list(field, other)
+        for pk, other_pk in rows.iterator():
+            loaded[pk].append(other_pk)
+        cache.set_many(
+            {
+                key_template.format(pk=pk): ids.tobytes()
+                for pk, ids in loaded.items()
+            },
+            settings.FOLLOW_GRAPH_TIMEOUT,
+        )
+        result.update(loaded)
+    return result
+
+
+def following_ids_many(user_ids):
+    """На кого подписан каждый из пользователей: {id: array}."""
+    return _load(FOLLOWING_KEY, 'user_id', 'author_id', user_ids)
+
+
+def follower_ids_many(user_ids):
+    """Кто подписан на каждого из пользователей: {id: array}."""
+    return _load(FOLLOWERS_KEY, 'author_id', 'user_id', user_ids)
+
+
+def following_ids(user_id):
+    return following_ids_many([user_id])[user_id]
+
+
+def follower_ids(user_id):
+    return follower_ids_many([user_id])[user_id]
+
+
+def contains(ids, pk):
+    """Есть ли pk в отсортированном массиве ids."""
+    index = bisect_left(ids, pk)
+    return index < len(ids) and ids[index] == pk
+
+
+def is_following(user_id, author_id):
+    return contains(following_ids(user_id), author_id)
+
+
+def following_among(user_id, author_ids):
+    """Те из author_ids, на кого подписан пользователь."""
+    ids = following_ids(user_id)
+    return {pk for pk in author_ids if contains(ids, pk)}
+
+
+def mutual_ids(user_id):
+    """Взаимные подписки: отсортированное пересечение двух массивов."""
+    following = following_ids(user_id)
+    followers = follower_ids(user_id)
+    result = array('I')
+    i = j = 0
+    while i < len(following) and j < len(followers):
+        if following[i] == followers[j]:
+            result.append(following[i])
+            i += 1
+            j += 1
+        elif following[i] < followers[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def invalidate(user_id, author_id):
+    """Сбрасывает массивы подписчика и автора.
+
+    Повторный сброс после коммита убирает массив, который другой
+    запрос мог успеть собрать по еще не закоммиченным данным.
+    """
+    keys = [
+        FOLLOWING_KEY.format(pk=user_id),
+        FOLLOWERS_KEY.format(pk=author_id),
+    ]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
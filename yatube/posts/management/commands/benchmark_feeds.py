@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.urls import reverse
+
+from core import benchmark
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, размер ответа, число запросов и прочитанных '
+        'строк для лент и страницы записи в HTML и в JSON API.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=0,
+            help='Потоки, которые пишут записи и комментарии во время замера.',
+        )
+        parser.add_argument(
+            '--output', help='Куда сохранить результаты в формате JSON.'
+        )
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=1.2,
+            help='Во сколько раз может вырасти p95 до регрессии.',
+        )
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError(
+                'В базе нет записей, сначала выполните seed_social.'
+            )
+        reader = (
+            User.objects.annotate(follows=Count('follower'))
+            .order_by('-follows', 'pk')
+            .first()
+        )
+        targets = self._targets()
+        writers = benchmark.Writers(options['writers'], reader, self._writes())
+        with writers:
+            results = benchmark.run(
+                targets, options['requests'], options['warmup'], user=reader
+            )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'{result["rps"]} запр/с, {result["bytes"]} байт, '
+                f'запросов {result["queries"]}, строк {result["rows"]}'
+            )
+        if options['writers']:
+            self.stdout.write(
+                f'Писатели: {writers.stats["writes"]} записей '
+                f'({writers.stats["writes_per_second"]} в секунду), '
+                f'ошибок {writers.stats["errors"]}'
+            )
+        payload = {
+            'environment': benchmark.environment(),
+            'scale': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+                'comments': Comment.objects.count(),
+            },
+            'writers': writers.stats,
+            'views': results,
+        }
+        if options['output']:
+            benchmark.save(options['output'], payload)
+        if options['compare']:
+            baseline = benchmark.load(options['compare'])
+            lines, regressions = benchmark.compare(
+                baseline['views'], results, threshold=options['threshold']
+            )
+            for line in lines:
+                self.stdout.write(line)
+            if regressions:
+                raise CommandError(
+                    'Регрессия производительности: ' + ', '.join(regressions)
+                )
+
+    def _writes(self):
+        """Запросы писателей: новые записи и комментарии."""
+        return [
+            (reverse('posts:post_create'), {'text': 'Нагрузочная запись'}),
+            (
+                reverse('posts:add_comment', args=[self.hot_post.pk]),
+                {'text': 'Нагрузочный комментарий'},
+            ),
+        ]
+
+    def _targets(self):
+        """Самые нагруженные страницы каждого вида."""
+        last_page = max(Post.objects.count() // 10, 1)
+        targets = {
+            'index': reverse('posts:index'),
+            'index_deep': f'{reverse("posts:index")}?page={last_page}',
+            'follow_index': reverse('posts:follow_index'),
+        }
+        group = (
+            Group.objects.annotate(total=Count('posts'))
+            .order_by('-total', 'pk')
+            .first()
+        )
+        if group is not None:
+            targets['group_list'] = reverse(
+                'posts:group_list', args=[group.slug]
+            )
+        author = (
+            User.objects.annotate(total=Count('posts'))
+            .order_by('-total', 'pk')
+            .first()
+        )
+        targets['profile'] = reverse('posts:profile', args=[author.username])
+        self.hot_post = (
+            Post.objects.annotate(total=Count('comments'))
+            .order_by('-total', 'pk')
+            .first()
+        )
+        targets['post_detail'] = reverse(
+            'posts:post_detail', args=[self.hot_post.pk]
+        )
+        targets['api_index'] = reverse('api:v1:post_list')
+        targets['api_follow_index'] = reverse('api:v1:follow_index')
+        targets['api_post_detail'] = reverse(
+            'api:v1:post_detail', args=[self.hot_post.pk]
+        )
+        return targets
@@ -0,0 +1,142 @@
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import benchmark, journal
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+TEXT = 'Нагрузочный комментарий журнала'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность записи комментариев и подписок '
+        'сразу в базу и через журнал отложенной записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=8,
+            help='Сколько потоков одновременно пишут через представления.',
+        )
+        parser.add_argument(
+            '--writes',
+            type=int,
+            default=200,
+            help='Сколько запросов отправляет каждый поток.',
+        )
+        parser.add_argument(
+            '--output', help='Куда сохранить результаты в формате JSON.'
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author').order_by('-pk').first()
+        writers = list(
+            User.objects.exclude(pk=getattr(post, 'author_id', None))
+            .order_by('pk')[:options['writers']]
+        )
+        if post is None or len(writers) < options['writers']:
+            raise CommandError(
+                'Не хватает записей или пользователей, сначала выполните '
+                'seed_social.'
+            )
+        results = {}
+        try:
+            for mode, write_behind in (('direct', False), ('journal', True)):
+                with tempfile.TemporaryDirectory() as directory:
+                    with override_settings(
+                        WRITE_BEHIND=write_behind,
+                        WRITE_BEHIND_DIR=directory,
+                    ):
+                        results[mode] = self._run(
+                            post, writers, options['writes']
+                        )
+        finally:
+            Comment.objects.filter(text=TEXT).delete()
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["requests"]} запросов за '
+                f'{result["seconds"]} с, {result["rps"]} запр/с, '
+                f'{result["rows_per_second"]} строк/с, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
+        if options['output']:
+            benchmark.save(
+                options['output'],
+                {
+                    'environment': benchmark.environment(),
+                    'options': {
+                        key: options[key] for key in ('writers', 'writes')
+                    },
+                    'modes': results,
+                },
+            )
+
+    def _run(self, post, writers, writes):
+        """Потоки по кругу комментируют запись, подписываются на ее
+        автора и отписываются; время включает сброс журнала."""
+        requests = [
+            (reverse('posts:add_comment', args=[post.pk]), {'text': TEXT}),
+            (reverse('posts:profile_follow', args=[post.author.username]), {}),
+            (
+                reverse('posts:profile_unfollow', args=[post.author.username]),
+                {},
+            ),
+        ]
+        samples = []
+        errors = []
+        lock = threading.Lock()
+        comments_before = Comment.objects.filter(text=TEXT).count()
+
+        def work(user):
+            client = Client()
+            client.force_login(user)
+            own_samples, own_errors = [], 0
+            try:
+                for number in range(writes):
+                    url, data = requests[number % len(requests)]
+                    started = time.perf_counter()
+                    try:
+                        ok = client.post(url, data).status_code < 400
+                    except Exception:
+                        ok = False
+                    own_samples.append(
+                        (time.perf_counter() - started) * 1000
+                    )
+                    own_errors += not ok
+            finally:
+                connection.close()
+            with lock:
+                samples.extend(own_samples)
+                errors.append(own_errors)
+
+        threads = [
+            threading.Thread(target=work, args=[user]) for user in writers
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        journal.flush()
+        seconds = time.perf_counter() - started
+        rows = Comment.objects.filter(text=TEXT).count() - comments_before
+        return {
+            'seconds': round(seconds, 3),
+            'rps': round(len(samples) / seconds, 2),
+            'rows_per_second': round(rows / seconds, 2),
+            'comments': rows,
+            'errors': sum(errors),
+            **benchmark.summarize(samples),
+        }
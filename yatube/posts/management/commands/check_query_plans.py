@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import query_plans
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Сортировки, без которых страница не обходится.
+ACCEPTED = {
+    ('search', 'USE TEMP B-TREE FOR ORDER BY'): (
+        'выдача поиска сортируется по релевантности BM25'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для всех запросов страниц и падает, '
+        'если в плане есть полный просмотр таблицы или временная сортировка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать план каждого запроса.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            failures = self._check(options['verbose_plans'])
+            transaction.set_rollback(True)
+        if failures:
+            raise CommandError(
+                f'Найдено проблемных запросов: {failures}'
+            )
+        self.stdout.write('Планы запросов в порядке.')
+
+    def _fixture(self):
+        """Минимальные данные, чтобы открылись все страницы."""
+        author = User.objects.create_user(username='plan_author')
+        reader = User.objects.create_user(username='plan_reader')
+        group = Group.objects.create(
+            title='Планы', slug='plan-group', description='Планы'
+        )
+        post = Post.objects.create(text='план', author=author, group=group)
+        Comment.objects.create(text='план', author=reader, post=post)
+        Follow.objects.create(user=reader, author=author)
+        return reader, {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=[group.slug]),
+            'profile': reverse('posts:profile', args=[author.username]),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'post_edit': reverse('posts:post_edit', args=[post.pk]),
+            'follow_index': reverse('posts:follow_index'),
+            'search': f'{reverse("posts:search")}?q=план',
+        }
+
+    def _check(self, verbose):
+        reader, targets = self._fixture()
+        client = Client()
+        client.force_login(reader)
+        failures = 0
+        for name, url in targets.items():
+            with CaptureQueriesContext(connection) as captured:
+                client.get(url)
+            for query in captured.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = query_plans.explain(sql)
+                found = [
+                    step for step in query_plans.problems(plan)
+                    if (name, step) not in ACCEPTED
+                ]
+                if verbose or found:
+                    self.stdout.write(f'{name}: {sql}')
+                    for step in plan:
+                        marker = '!!' if step in found else '  '
+                        self.stdout.write(f'  {marker} {step}')
+                failures += bool(found)
+        return failures
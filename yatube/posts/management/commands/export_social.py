@@ -0,0 +1,49 @@
+import sys
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, записи, комментарии '
+        'и подписки в NDJSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            nargs='?',
+            default='-',
+            help='Файл выгрузки (.gz сжимается), по умолчанию stdout.',
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--models',
+            nargs='+',
+            default=transfer.MODELS,
+            choices=transfer.MODELS,
+            help='Какие модели выгружать.',
+        )
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            output = sys.stdout
+        else:
+            output = transfer.open_file(options['output'], 'w')
+        try:
+            for label in transfer.MODELS:
+                if label not in options['models']:
+                    continue
+                total = 0
+                for row in transfer.dump_rows(
+                    apps.get_model(label), options['batch_size']
+                ):
+                    output.write(row + '\n')
+                    total += 1
+                self.stderr.write(f'{label}: {total}')
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,160 @@
+import json
+import os
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts import cards, freshness, graph, search, timeline, transfer
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON из export_social пачками bulk_create. '
+        'После сбоя продолжает с последней сохраненной пачки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл выгрузки (.gz тоже).')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл прогресса, по умолчанию <input>.checkpoint.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, не глядя на сохраненный прогресс.',
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Не пересобирать ленты, поиск и счетчики после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['input']):
+            raise CommandError(f'Нет файла {options["input"]}')
+        self.checkpoint = (
+            options['checkpoint'] or f'{options["input"]}.checkpoint'
+        )
+        self.batch_size = options['batch_size']
+        self.skipped = {}
+        done = 0 if options['restart'] else self._read_checkpoint()
+        if done:
+            self.stdout.write(f'Продолжаем со строки {done + 1}')
+        total = self._load(options['input'], done)
+        self._reset_sequences()
+        if not options['skip_rebuild']:
+            self.stdout.write('Пересобираем ленты, поиск и счетчики...')
+            timeline.rebuild_all()
+            search.get_backend().rebuild()
+            call_command('rebuild_counters', stdout=self.stdout)
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(f'Загружено строк: {total}')
+        for label, skipped in self.skipped.items():
+            self.stdout.write(
+                f'{label}: пропущено строк {skipped} '
+                '(уже загружены или нарушают ограничения)'
+            )
+
+    def _load(self, path, done):
+        """Читает файл построчно и сохраняет объекты пачками."""
+        batch, line_number = [], 0
+        with transfer.open_file(path, 'r') as source:
+            for line_number, line in enumerate(source, 1):
+                if line_number <= done or not line.strip():
+                    continue
+                try:
+                    obj = transfer.load_row(line)
+                except (ValueError, LookupError, KeyError) as error:
+                    raise CommandError(
+                        f'Строка {line_number}: {error}'
+                    ) from error
+                if batch and (
+                    type(obj) is not type(batch[0])
+                    or len(batch) >= self.batch_size
+                ):
+                    self._flush(batch, line_number - 1)
+                    batch = []
+                batch.append(obj)
+        if batch:
+            self._flush(batch, line_number)
+        return line_number
+
+    def _read_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint, encoding='utf-8') as source:
+            return json.load(source)['line']
+
+    def _flush(self, batch, line_number):
+        """Сохраняет пачку и запоминает, до какой строки дошли.
+
+        Уже загруженные строки пропускаются, поэтому повтор пачки
+        после сбоя между коммитом и записью прогресса безопасен.
+        Пропущенные строки считаются по числу строк в диапазоне pk
+        пачки до и после вставки.
+        """
+        model = type(batch[0])
+        pks = [obj.pk for obj in batch]
+        in_range = model.objects.filter(pk__gte=min(pks), pk__lte=max(pks))
+        with transaction.atomic():
+            before = in_range.count()
+            with transfer.original_dates(model, batch):
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            inserted = in_range.count() - before
+        if inserted < len(batch):
+            label = model._meta.label_lower
+            self.skipped[label] = (
+                self.skipped.get(label, 0) + len(batch) - inserted
+            )
+        self._invalidate(model, batch)
+        with open(self.checkpoint, 'w', encoding='utf-8') as output:
+            json.dump({'line': line_number}, output)
+        self.stdout.write(
+            f'{model._meta.label_lower}: до строки {line_number}'
+        )
+
+    def _invalidate(self, model, batch):
+        """Сбрасывает страницы, карточки и граф подписок, как это
+        сделали бы сигналы: bulk_create их не посылает."""
+        scopes = set()
+        if model is User:
+            pks = [obj.pk for obj in batch]
+            cards.invalidate('author', *pks)
+            scopes.update(f'user:{pk}' for pk in pks)
+        elif model is Group:
+            pks = [obj.pk for obj in batch]
+            cards.invalidate('group', *pks)
+            scopes.update(f'group:{pk}' for pk in pks)
+        elif model is Post:
+            cards.invalidate('post', *(obj.pk for obj in batch))
+            scopes.add('posts')
+            for obj in batch:
+                scopes.update([f'post:{obj.pk}', f'user:{obj.author_id}'])
+                if obj.group_id:
+                    scopes.add(f'group:{obj.group_id}')
+        elif model is Comment:
+            scopes.update(f'post:{obj.post_id}' for obj in batch)
+        elif model is Follow:
+            for obj in batch:
+                graph.invalidate(obj.user_id, obj.author_id)
+                scopes.update([f'user:{obj.user_id}', f'user:{obj.author_id}'])
+        freshness.touch(*scopes)
+
+    def _reset_sequences(self):
+        """Сдвигает автоинкремент за загруженные pk (нужно PostgreSQL)."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [apps.get_model(label) for label in transfer.MODELS]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post, PostCounter, UserCounter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики записей, подписок и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправляя.',
+        )
+
+    def handle(self, *args, **options):
+        drift = 0
+        for user_id in User.objects.values_list('id', flat=True).iterator():
+            drift += self._sync(
+                UserCounter,
+                {'user_id': user_id},
+                counters.exact_user_counts(user_id),
+                f'user={user_id}',
+                options['dry_run'],
+            )
+        for post_id in Post.objects.values_list('id', flat=True).iterator():
+            drift += self._sync(
+                PostCounter,
+                {'post_id': post_id},
+                counters.exact_post_counts(post_id),
+                f'post={post_id}',
+                options['dry_run'],
+            )
+        self.stdout.write(f'Расхождений найдено: {drift}')
+
+    def _sync(self, model, key, exact, label, dry_run):
+        """Сверяет строку счетчиков с точными значениями."""
+        counter = model.objects.filter(**key).first()
+        if counter is None:
+            if not dry_run:
+                model.objects.create(**key, **exact)
+            return 0
+        drift = 0
+        for field, value in exact.items():
+            stored = getattr(counter, field)
+            if stored != value:
+                drift += 1
+                self.stdout.write(f'{label} {field}: {stored} -> {value}')
+                setattr(counter, field, value)
+        if drift and not dry_run:
+            counter.save(update_fields=list(exact))
+        return drift
@@ -0,0 +1,118 @@
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from faker import Faker
+
+from posts import counters, search, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу синтетическими данными для нагрузочных замеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        sentences = [self.fake.paragraph() for _ in range(1000)]
+
+        users = self._seed_users(options['users'])
+        groups = self._seed_groups(options['groups'])
+        self._bulk(
+            Post,
+            options['posts'],
+            lambda: Post(
+                text=self.random.choice(sentences),
+                author_id=self.random.choice(users),
+                group_id=self.random.choice(groups + [None]),
+            ),
+        )
+        self._seed_follows(users, options['follows'])
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        self._bulk(
+            Comment,
+            options['comments'] if post_ids else 0,
+            lambda: Comment(
+                text=self.random.choice(sentences),
+                author_id=self.random.choice(users),
+                post_id=self.random.choice(post_ids),
+            ),
+        )
+        self.stdout.write('Собираем ленты подписок и поисковый индекс...')
+        counters.create_missing()
+        timeline.rebuild_all()
+        search.get_backend().rebuild()
+        self.stdout.write(
+            f'Готово: пользователей {User.objects.count()}, '
+            f'записей {Post.objects.count()}, '
+            f'подписок {Follow.objects.count()}, '
+            f'комментариев {Comment.objects.count()}.'
+        )
+
+    def _bulk(self, model, total, factory):
+        """Создает объекты пачками по batch_size."""
+        created = 0
+        while created < total:
+            size = min(self.batch_size, total - created)
+            with transaction.atomic():
+                model.objects.bulk_create([factory() for _ in range(size)])
+            created += size
+            self.stdout.write(f'{model.__name__}: {created}/{total}')
+
+    def _seed_users(self, total):
+        numbers = itertools.count(User.objects.count())
+        self._bulk(
+            User,
+            total,
+            lambda: User(
+                username=f'bench_user_{next(numbers)}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+            ),
+        )
+        return list(User.objects.values_list('id', flat=True))
+
+    def _seed_groups(self, total):
+        numbers = itertools.count(Group.objects.count())
+        self._bulk(
+            Group,
+            total,
+            lambda: Group(
+                title=self.fake.catch_phrase(),
+                slug=f'bench-group-{next(numbers)}',
+                description=self.fake.paragraph(),
+            ),
+        )
+        return list(Group.objects.values_list('id', flat=True))
+
+    def _seed_follows(self, users, total):
+        """Создает уникальные подписки без подписок на самого себя."""
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        total = min(total, len(users) * (len(users) - 1) - len(existing))
+        pairs = set()
+        while len(pairs) < total:
+            pair = tuple(self.random.sample(users, 2))
+            if pair not in existing:
+                pairs.add(pair)
+        pairs = iter(pairs)
+
+        def make_follow():
+            user_id, author_id = next(pairs)
+            return Follow(user_id=user_id, author_id=author_id)
+
+        self._bulk(Follow, total, make_follow)
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-17 18:02
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_search USING fts5('
+        'post_id UNINDEXED, body, tokenize="unicode61 remove_diacritics 0")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, post_id, body) '
+        'SELECT id * 2, id, text FROM posts_post'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, post_id, body) '
+        'SELECT id * 2 + 1, post_id, text FROM posts_comment'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
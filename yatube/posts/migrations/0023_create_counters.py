@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def _grouped(queryset, field):
+    return dict(
+        queryset.values(field).annotate(total=Count('id'))
+        .values_list(field, 'total')
+    )
+
+
+def create_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    PostCounter = apps.get_model('posts', 'PostCounter')
+    posts = _grouped(Post.objects.all(), 'author_id')
+    followers = _grouped(Follow.objects.all(), 'author_id')
+    following = _grouped(Follow.objects.all(), 'user_id')
+    UserCounter.objects.bulk_create(
+        [
+            UserCounter(
+                user_id=pk,
+                posts_count=posts.get(pk, 0),
+                followers_count=followers.get(pk, 0),
+                following_count=following.get(pk, 0),
+            )
+            for pk in User.objects.filter(counters__isnull=True)
+            .values_list('pk', flat=True)
+        ],
+        batch_size=1000,
+    )
+    comments = _grouped(Comment.objects.all(), 'post_id')
+    PostCounter.objects.bulk_create(
+        [
+            PostCounter(post_id=pk, comments_count=comments.get(pk, 0))
+            for pk in Post.objects.filter(counters__isnull=True)
+            .values_list('pk', flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0022_timeline_created'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
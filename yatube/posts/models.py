@@ -42,8 +42,29 @@ class Post(CreationDateModel):
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Картинка из базы: миниатюры готовятся, только если она сменилась.
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        return instance
+
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'], name='post_created_id_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_idx',
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_idx',
+            ),
+        ]
         verbose_name = 'Запись'
         verbose_name_plural = 'Записи'
 
@@ -65,6 +86,12 @@ class Comment(CreationDateModel):
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -93,3 +120,80 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_follow'
             )
         ]
+        # unique_follow покрывает выборку подписок читателя,
+        # этот индекс - выборку подписчиков автора.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись в ленте подписок пользователя (fan-out on write)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись',
+    )
+    # Копия Post.created: лента читается по индексу без соединения.
+    created = models.DateTimeField('Дата записи')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+
+
+class UserCounter(models.Model):
+    """Денормализованные счетчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.IntegerField('Записей', default=0)
+    followers_count = models.IntegerField('Подписчиков', default=0)
+    following_count = models.IntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class PostCounter(models.Model):
+    """Денормализованные счетчики записи."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Запись',
+    )
+    comments_count = models.IntegerField('Комментариев', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики записи'
+        verbose_name_plural = 'Счетчики записей'
@@ -0,0 +1,155 @@
+"""Уведомления о новых записях в ленте подписок.
+
+Новая запись публикуется после коммита в канал автора author:{id}.
+Клиент ленты подписывается на каналы тех, на кого подписан, и получает
+счетчик записей новее since - последней записи, которую он видел.
+Поток SSE (follow_events) и long-poll (follow_events_poll) отдают одно
+и то же событие new_posts: {"count": N, "latest": id}.
+"""
+import asyncio
+import json
+import time
+
+from core import pubsub
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import graph, timeline
+
+CHANNEL = 'author:{pk}'
+
+
+def publish_post(post_id, author_id):
+    """Сообщает подписчикам автора о новой записи."""
+    pubsub.get_backend().publish(
+        CHANNEL.format(pk=author_id),
+        {'post_id': post_id, 'author_id': author_id},
+    )
+
+
+def parse_since(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class NewPosts:
+    """Счетчик новых записей ленты пользователя поверх подписки."""
+
+    def __init__(self, user, since):
+        self.since = since
+        self.count = 0
+        self.latest = since
+        self.subscription = pubsub.get_backend().subscribe(
+            CHANNEL.format(pk=pk) for pk in graph.following_ids(user.pk)
+        )
+        if since is not None:
+            ids = list(
+                timeline.feed_for(user)
+                .filter(pk__gt=since)
+                .order_by('-pk')
+                .values_list('pk', flat=True)
+            )
+            self.count = len(ids)
+            self.latest = ids[0] if ids else since
+
+    def add(self, messages):
+        """Учитывает сообщения; возвращает True, если счетчик вырос."""
+        grown = False
+        for message in messages:
+            post_id = message['post_id']
+            if self.latest is not None and post_id <= self.latest:
+                continue
+            self.count += 1
+            self.latest = post_id
+            grown = True
+        return grown
+
+    def data(self):
+        return {'count': self.count, 'latest': self.latest}
+
+    def close(self):
+        self.subscription.close()
+
+
+def open_new_posts(user, since):
+    """Создает NewPosts в пуле потоков и возвращает соединение с базой."""
+    try:
+        return NewPosts(user, since)
+    finally:
+        close_old_connections()
+
+
+def sse_event(data):
+    return (
+        f'event: new_posts\nid: {data["latest"]}\n'
+        f'data: {json.dumps(data)}\n\n'
+    ).encode()
+
+
+def sse_start():
+    return f'retry: {settings.SSE_RETRY}\n\n'.encode()
+
+
+SSE_PING = b': ping\n\n'
+
+
+def stream(new_posts, duration):
+    """Синхронный поток SSE на duration секунд.
+
+    Подписку закрывает ответ, а не генератор: finally генератора,
+    который так и не начали читать, не выполняется.
+    """
+    yield sse_start()
+    if new_posts.count:
+        yield sse_event(new_posts.data())
+    deadline = time.monotonic() + duration
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return
+        messages = new_posts.subscription.get(
+            min(left, settings.SSE_HEARTBEAT)
+        )
+        yield (
+            sse_event(new_posts.data())
+            if new_posts.add(messages) else SSE_PING
+        )
+
+
+async def astream(new_posts):
+    """Асинхронный поток SSE: без срока, до отключения клиента.
+    Подписку, как и в stream, закрывает ответ."""
+    yield sse_start()
+    if new_posts.count:
+        yield sse_event(new_posts.data())
+    while True:
+        messages = await new_posts.subscription.aget(settings.SSE_HEARTBEAT)
+        yield (
+            sse_event(new_posts.data())
+            if new_posts.add(messages) else SSE_PING
+        )
+
+
+def wait(new_posts, timeout):
+    """Long-poll: ждет первой новой записи не дольше timeout."""
+    deadline = time.monotonic() + timeout
+    while not new_posts.count:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            break
+        new_posts.add(new_posts.subscription.get(left))
+    return new_posts.data()
+
+
+async def await_new(new_posts, timeout):
+    """Асинхронный вариант wait."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not new_posts.count:
+        left = deadline - loop.time()
+        if left <= 0:
+            break
+        new_posts.add(await new_posts.subscription.aget(left))
+    return new_posts.data()
@@ -0,0 +1,211 @@
+"""Полнотекстовый поиск по записям и комментариям.
+
+SQLiteFTSBackend держит инвертированный индекс в виртуальной таблице
+FTS5 и ранжирует выдачу по BM25. Для других СУБД есть SimpleBackend
+на icontains. Бэкенд выбирается настройкой SEARCH_BACKEND, индекс
+обновляется сигналами при каждом сохранении.
+"""
+import base64
+import json
+import re
+
+from collections import namedtuple
+
+from core.paginator import CursorPaginator
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+SearchResult = namedtuple('SearchResult', 'post comment snippet')
+SearchPage = namedtuple('SearchPage', 'results next_cursor')
+
+TABLE = 'posts_search'
+MARK_START = '\x02'
+MARK_END = '\x03'
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _highlight(text):
+    """Экранирует фрагмент и превращает маркеры в <mark>."""
+    return (
+        escape(text)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def _terms(query):
+    return TERM_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post):
+        pass
+
+    def index_comment(self, comment):
+        pass
+
+    def remove_comment(self, comment):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, cursor=None, limit=None):
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Индекс FTS5: rowid кодирует тип и id объекта."""
+
+    @staticmethod
+    def _rowid(kind, pk):
+        return pk * 2 + (kind == 'comment')
+
+    def _replace(self, rowid, post_id, body):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, post_id, body) '
+                'VALUES (%s, %s, %s)',
+                [rowid, post_id, body],
+            )
+
+    def _delete(self, rowid):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+
+    def index_post(self, post):
+        self._replace(self._rowid('post', post.pk), post.pk, post.text)
+
+    def remove_post(self, post):
+        self._delete(self._rowid('post', post.pk))
+
+    def index_comment(self, comment):
+        self._replace(
+            self._rowid('comment', comment.pk), comment.post_id, comment.text
+        )
+
+    def remove_comment(self, comment):
+        self._delete(self._rowid('comment', comment.pk))
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, post_id, body) '
+                'SELECT id * 2, id, text FROM posts_post'
+            )
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, post_id, body) '
+                'SELECT id * 2 + 1, post_id, text FROM posts_comment'
+            )
+
+    @staticmethod
+    def _encode_cursor(score, rowid):
+        raw = json.dumps([score, rowid]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(token):
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            score, rowid = json.loads(raw)
+            return float(score), int(rowid)
+        except (ValueError, TypeError):
+            return None
+
+    def search(self, query, cursor=None, limit=None):
+        limit = limit or settings.SEARCH_RESULTS_PER_PAGE
+        terms = _terms(query)
+        if not terms:
+            return SearchPage([], None)
+        match = ' '.join('"{}"*'.format(term) for term in terms)
+        params = [MARK_START, MARK_END, match]
+        position = self._decode_cursor(cursor) if cursor else None
+        after = ''
+        if position is not None:
+            after = 'WHERE score > %s OR (score = %s AND rowid > %s)'
+            params += [position[0], position[0], position[1]]
+        sql = (
+            'SELECT rowid, post_id, score, snippet FROM ('
+            f' SELECT rowid, post_id, bm25({TABLE}) AS score,'
+            f' snippet({TABLE}, 1, %s, %s, \'…\', 16) AS snippet'
+            f' FROM {TABLE} WHERE {TABLE} MATCH %s'
+            f') {after} ORDER BY score, rowid LIMIT %s'
+        )
+        params.append(limit + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            {row[1] for row in rows}
+        )
+        comments = Comment.objects.select_related('author').in_bulk(
+            {row[0] // 2 for row in rows if row[0] % 2}
+        )
+        results = [
+            SearchResult(
+                post=posts[post_id],
+                comment=comments.get(rowid // 2) if rowid % 2 else None,
+                snippet=_highlight(snippet),
+            )
+            for rowid, post_id, _, snippet in rows
+            if post_id in posts
+        ]
+        next_cursor = None
+        if has_more:
+            next_cursor = self._encode_cursor(rows[-1][2], rows[-1][0])
+        return SearchPage(results, next_cursor)
+
+
+class SimpleBackend(BaseSearchBackend):
+    """Поиск через icontains для СУБД без полнотекстового индекса."""
+
+    def _snippet(self, text, terms):
+        pattern = re.compile(
+            '|'.join(re.escape(term) for term in terms), re.IGNORECASE
+        )
+        text = pattern.sub(
+            lambda match: f'{MARK_START}{match.group(0)}{MARK_END}', text
+        )
+        return _highlight(text)
+
+    def search(self, query, cursor=None, limit=None):
+        limit = limit or settings.SEARCH_RESULTS_PER_PAGE
+        terms = _terms(query)
+        if not terms:
+            return SearchPage([], None)
+        condition = Q()
+        for term in terms:
+            condition &= Q(text__icontains=term) | Q(
+                comments__text__icontains=term
+            )
+        post_set = (
+            Post.objects.select_related('author', 'group')
+            .filter(condition)
+            .distinct()
+        )
+        page = CursorPaginator(post_set, limit).get_page(cursor)
+        results = [
+            SearchResult(
+                post=post,
+                comment=None,
+                snippet=self._snippet(post.text, terms),
+            )
+            for post in page
+        ]
+        return SearchPage(results, page.next_cursor)
+
+
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
@@ -0,0 +1,138 @@
+from functools import partial
+
+from core import journal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import (
+    cards,
+    counters,
+    freshness,
+    graph,
+    notifications,
+    search,
+    thumbnails,
+    timeline,
+    writes,
+)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """Обновляет ленты, счетчики, карточки, миниатюры и поиск,
+    о новой записи сообщает подписчикам автора."""
+    cards.invalidate('post', instance.pk)
+    freshness.touch(
+        'posts', f'post:{instance.pk}', f'user:{instance.author_id}'
+    )
+    search.get_backend().index_post(instance)
+    image = instance.image.name
+    if image and image != getattr(instance, '_loaded_image', None):
+        thumbnails.schedule(image)
+    instance._loaded_image = image
+    if created:
+        counters.start_post(instance.pk)
+        # Раскладка решает по счетчику подписчиков автора, поэтому
+        # счетчики сдвигаются до нее.
+        counters.change_user(instance.author_id, posts_count=1)
+        timeline.fan_out_post(instance)
+        transaction.on_commit(
+            partial(
+                notifications.publish_post, instance.pk, instance.author_id
+            )
+        )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Убирает запись из счетчиков и поискового индекса."""
+    freshness.touch(
+        'posts', f'post:{instance.pk}', f'user:{instance.author_id}'
+    )
+    search.get_backend().remove_post(instance)
+    counters.change_user(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Индексирует комментарий и учитывает его в счетчиках."""
+    freshness.touch(f'post:{instance.post_id}')
+    search.get_backend().index_comment(instance)
+    if created:
+        counters.change_post(instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Убирает комментарий из счетчиков и поискового индекса."""
+    freshness.touch(f'post:{instance.post_id}')
+    search.get_backend().remove_comment(instance)
+    counters.change_post(instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Наполняет ленту нового подписчика и обновляет счетчики
+    и граф подписок."""
+    freshness.touch(f'user:{instance.user_id}', f'user:{instance.author_id}')
+    graph.invalidate(instance.user_id, instance.author_id)
+    if created and instance.user_id and instance.author_id:
+        counters.change_user(instance.user_id, following_count=1)
+        counters.change_user(instance.author_id, followers_count=1)
+        timeline.add_author(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Очищает ленту после отписки и обновляет счетчики
+    и граф подписок."""
+    freshness.touch(f'user:{instance.user_id}', f'user:{instance.author_id}')
+    graph.invalidate(instance.user_id, instance.author_id)
+    if instance.user_id and instance.author_id:
+        timeline.remove_author(instance.user_id, instance.author_id)
+        counters.change_user(instance.user_id, following_count=-1)
+        counters.change_user(instance.author_id, followers_count=-1)
+        timeline.author_unfollowed(instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Заводит счетчики нового пользователя, сбрасывает карточки
+    записей после правки автора и страницы записей с его
+    комментариями."""
+    if created:
+        counters.start_user(instance.pk)
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    cards.invalidate('author', instance.pk)
+    commented = Comment.objects.filter(author=instance).values_list(
+        'post_id', flat=True
+    ).distinct()
+    freshness.touch(
+        'posts',
+        f'user:{instance.pk}',
+        *(f'post:{post_id}' for post_id in commented),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    """Сбрасывает карточки записей после правки или удаления группы."""
+    cards.invalidate('group', instance.pk)
+    freshness.touch('posts', f'group:{instance.pk}')
+
+
+@receiver(journal.submitted)
+def write_submitted(sender, user_id, data, **kwargs):
+    """Сбрасывает страницы, на которых автор операции из журнала должен
+    увидеть ее до сброса в базу."""
+    if sender is writes.add_comment:
+        freshness.touch(f'post:{data["post_id"]}')
+    elif sender in (writes.follow, writes.unfollow):
+        freshness.touch(f'user:{user_id}', f'user:{data["author_id"]}')
@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return mark_safe(
+        cards.render_card(
+            post, author=context.get('author'), group=context.get('group')
+        )
+    )
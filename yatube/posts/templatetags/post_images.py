@@ -0,0 +1,12 @@
+from django import template
+
+from posts import variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture_sources(image):
+    if not image:
+        return None
+    return variants.picture(image.name)
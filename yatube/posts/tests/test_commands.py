@@ -0,0 +1,227 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import counters, transfer
+from ..models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    UserCounter,
+)
+
+User = get_user_model()
+
+
+class RebuildCountersCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(text='Тестовая запись', author=cls.user)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда находит и исправляет расхождения счетчиков."""
+        UserCounter.objects.filter(user=self.user).update(posts_count=42)
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        self.assertIn('posts_count: 42 -> 1', out.getvalue())
+        self.assertEqual(counters.for_user(self.user).posts_count, 1)
+
+    def test_dry_run_keeps_counters(self):
+        """С --dry-run команда только сообщает о расхождениях."""
+        UserCounter.objects.filter(user=self.user).update(posts_count=42)
+        call_command('rebuild_counters', dry_run=True, stdout=StringIO())
+        self.assertEqual(counters.for_user(self.user).posts_count, 42)
+
+
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_social',
+            users=5,
+            groups=2,
+            posts=30,
+            follows=6,
+            comments=20,
+            batch_size=10,
+            stdout=StringIO(),
+        )
+
+    def setUp(self):
+        self.output = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+
+    def tearDown(self):
+        if os.path.exists(self.output):
+            os.remove(self.output)
+        os.rmdir(os.path.dirname(self.output))
+
+    def test_seed_social_creates_data(self):
+        """seed_social создает данные и собирает ленты подписок."""
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 20)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_benchmark_saves_results(self):
+        """benchmark_feeds сохраняет процентили, запросы и строки."""
+        call_command(
+            'benchmark_feeds',
+            requests=2,
+            warmup=0,
+            output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output, encoding='utf-8') as source:
+            payload = json.load(source)
+        self.assertEqual(payload['scale']['posts'], 30)
+        for name in ('index', 'follow_index', 'profile', 'post_detail'):
+            result = payload['views'][name]
+            self.assertEqual(result['status'], 200)
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'rows'):
+                self.assertIn(key, result)
+            self.assertGreater(result['rows'], 0)
+
+    def test_benchmark_detects_regression(self):
+        """Рост числа запросов против базового прогона - регрессия."""
+        call_command(
+            'benchmark_feeds', requests=1, warmup=0, output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output, encoding='utf-8') as source:
+            payload = json.load(source)
+        for result in payload['views'].values():
+            result['queries'] -= 1
+        with open(self.output, 'w', encoding='utf-8') as target:
+            json.dump(payload, target)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_feeds', requests=1, warmup=0,
+                compare=self.output, stdout=StringIO(),
+            )
+
+
+class CheckQueryPlansCommandTests(TestCase):
+    def test_views_use_indexes(self):
+        """Запросы страниц обходятся без полных просмотров и сортировок."""
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Планы запросов в порядке.', out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+class TransferCommandsTests(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(5):
+            post = Post.objects.create(
+                text=f'Запись {number}', author=author, group=group
+            )
+            Comment.objects.create(
+                text='Комментарий', author=reader, post=post
+            )
+        Follow.objects.create(user=reader, author=author)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'social.ndjson.gz')
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def _counts(self):
+        return [
+            model.objects.count()
+            for model in (User, Group, Post, Comment, Follow)
+        ]
+
+    def _export_and_clear(self):
+        call_command('export_social', self.path, stderr=StringIO())
+        counts = self._counts()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        return counts
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка переносят все объекты и связи."""
+        counts = self._export_and_clear()
+        call_command(
+            'import_social', self.path, batch_size=3, stdout=StringIO()
+        )
+        self.assertEqual(self._counts(), counts)
+        reader = User.objects.get(username='reader')
+        self.assertEqual(reader.timeline.count(), 5)
+        self.assertEqual(Post.objects.filter(group__slug='group').count(), 5)
+
+    def test_import_refreshes_pages_and_reports_skipped(self):
+        """После загрузки страницы не отдаются из кэша, а строки,
+        которые уже были в базе, попадают в отчет."""
+        counts = self._export_and_clear()
+        cache.clear()
+        index = reverse('posts:index')
+        self.assertNotContains(self.client.get(index), 'Запись 0')
+        call_command('import_social', self.path, stdout=StringIO())
+        self.assertContains(self.client.get(index), 'Запись 0')
+        out = StringIO()
+        call_command('import_social', self.path, restart=True, stdout=out)
+        self.assertEqual(self._counts(), counts)
+        self.assertIn('posts.post: пропущено строк 5', out.getvalue())
+        self.assertIn('posts.follow: пропущено строк 1', out.getvalue())
+
+    def test_import_keeps_created(self):
+        """Даты записей и комментариев не заменяются временем загрузки."""
+        old = timezone.make_aware(datetime(2015, 1, 1))
+        Post.objects.update(created=old)
+        Comment.objects.update(created=old)
+        dates = {
+            model: dict(model.objects.values_list('pk', 'created'))
+            for model in (Post, Comment)
+        }
+        self._export_and_clear()
+        call_command('import_social', self.path, stdout=StringIO())
+        for model, expected in dates.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(
+                    dict(model.objects.values_list('pk', 'created')),
+                    expected,
+                )
+
+    def test_resume_after_failure(self):
+        """После сбоя загрузка продолжается с сохраненной пачки."""
+        counts = self._export_and_clear()
+        with transfer.open_file(self.path, 'r') as source:
+            lines = source.readlines()
+        broken = lines[:6] + ['{"model": "posts.post"\n'] + lines[6:]
+        with transfer.open_file(self.path, 'w') as output:
+            output.writelines(broken)
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_social', self.path, batch_size=2, stdout=StringIO()
+            )
+        self.assertTrue(os.path.exists(f'{self.path}.checkpoint'))
+        self.assertEqual(Post.objects.count(), 2)
+        with transfer.open_file(self.path, 'w') as output:
+            output.writelines(lines[:6] + ['\n'] + lines[6:])
+        out = StringIO()
+        call_command('import_social', self.path, batch_size=2, stdout=out)
+        self.assertIn('Продолжаем со строки', out.getvalue())
+        self.assertEqual(self._counts(), counts)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint'))
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for author in cls.authors[:2]:
+            Follow.objects.create(user=cls.reader, author=author)
+        Follow.objects.create(user=cls.authors[0], author=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sorted_ids_cached(self):
+        """Массив подписок собирается один раз и потом читается
+        без запросов к базе."""
+        expected = sorted(author.pk for author in self.authors[:2])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(graph.following_ids(self.reader.pk)), expected
+            )
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                graph.is_following(self.reader.pk, self.authors[0].pk)
+            )
+            self.assertFalse(
+                graph.is_following(self.reader.pk, self.authors[2].pk)
+            )
+
+    def test_batch_membership(self):
+        author_ids = [author.pk for author in self.authors]
+        self.assertEqual(
+            graph.following_among(self.reader.pk, author_ids),
+            set(author_ids[:2]),
+        )
+        with self.assertNumQueries(1):
+            followers = graph.follower_ids_many(author_ids)
+        self.assertEqual(
+            {pk: list(ids) for pk, ids in followers.items()},
+            {
+                author_ids[0]: [self.reader.pk],
+                author_ids[1]: [self.reader.pk],
+                author_ids[2]: [],
+            },
+        )
+
+    def test_mutual_follows(self):
+        self.assertEqual(
+            list(graph.mutual_ids(self.reader.pk)), [self.authors[0].pk]
+        )
+
+    def test_follow_views_invalidate_graph(self):
+        client = Client()
+        client.force_login(self.reader)
+        author = self.authors[2]
+        graph.following_ids(self.reader.pk)
+        graph.follower_ids(author.pk)
+        client.get(reverse('posts:profile_follow', args=[author.username]))
+        self.assertTrue(graph.is_following(self.reader.pk, author.pk))
+        self.assertIn(self.reader.pk, graph.follower_ids(author.pk))
+        client.get(reverse('posts:profile_unfollow', args=[author.username]))
+        self.assertFalse(graph.is_following(self.reader.pk, author.pk))
+        self.assertNotIn(self.reader.pk, graph.follower_ids(author.pk))
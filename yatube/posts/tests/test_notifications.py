@@ -0,0 +1,187 @@
+import asyncio
+
+from core import pubsub
+from core.asgi import AsgiHandler
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from .. import notifications
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+def _no_wsgi(environ, start_response):
+    raise AssertionError('запрос не должен идти в пул WSGI')
+
+
+class PubSubTests(SimpleTestCase):
+    def test_local_delivery(self):
+        backend = pubsub.LocalPubSub()
+        with backend.subscribe(['a', 'b']) as subscription:
+            backend.publish('a', 1)
+            backend.publish('c', 2)
+            backend.publish('b', 3)
+            self.assertEqual(subscription.get(0), [1, 3])
+            self.assertEqual(subscription.get(0), [])
+        self.assertEqual(backend.channels(), [])
+
+    def test_async_wait_woken_from_thread(self):
+        backend = pubsub.LocalPubSub()
+
+        async def run():
+            with backend.subscribe(['a']) as subscription:
+                loop = asyncio.get_running_loop()
+                loop.call_later(
+                    0.01,
+                    lambda: loop.run_in_executor(
+                        None, backend.publish, 'a', 'новость'
+                    ),
+                )
+                return await subscription.aget(5)
+
+        self.assertEqual(asyncio.run(run()), ['новость'])
+
+    @override_settings(PUBSUB_POLL_INTERVAL=0.01)
+    def test_cache_delivery_between_instances(self):
+        """Сообщение, опубликованное одним процессом, доходит до
+        подписчиков другого через общий кэш."""
+        cache.clear()
+        publisher, listener = pubsub.CachePubSub(), pubsub.CachePubSub()
+        publisher.publish('a', 'старое')
+        with listener.subscribe(['a']) as subscription:
+            publisher.publish('a', 'новое')
+            self.assertEqual(subscription.get(5), ['новое'])
+
+
+class FollowEventsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.seen = Post.objects.create(text='Старая', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_anonymous_rejected(self):
+        for name in ('posts:follow_events', 'posts:follow_events_poll'):
+            with self.subTest(name=name):
+                response = Client().get(reverse(name))
+                self.assertEqual(response.status_code, 401)
+
+    def test_poll_counts_new_posts(self):
+        url = reverse('posts:follow_events_poll')
+        response = self.client.get(url, {'since': self.seen.pk, 'timeout': 0})
+        self.assertEqual(response.json(), {'count': 0, 'latest': self.seen.pk})
+        new = Post.objects.create(text='Новая', author=self.author)
+        response = self.client.get(url, {'since': self.seen.pk})
+        self.assertEqual(response.json(), {'count': 1, 'latest': new.pk})
+
+    def test_stream_starts_with_pending_count(self):
+        new = Post.objects.create(text='Новая', author=self.author)
+        response = self.client.get(
+            reverse('posts:follow_events'), HTTP_LAST_EVENT_ID=self.seen.pk
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'retry:'))
+        self.assertIn(f'id: {new.pk}'.encode(), next(chunks))
+        response.close()
+        self.assertEqual(pubsub.get_backend().channels(), [])
+
+    def test_unread_stream_unsubscribes_on_close(self):
+        """Подписка закрывается с ответом, даже если поток не читали."""
+        response = self.client.get(reverse('posts:follow_events'))
+        self.assertEqual(
+            pubsub.get_backend().channels(), [f'author:{self.author.pk}']
+        )
+        response.close()
+        self.assertEqual(pubsub.get_backend().channels(), [])
+
+    def test_feed_page_subscribes_from_first_post(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, "var since = '%d'" % self.seen.pk)
+
+
+class PublishOnCommitTests(TransactionTestCase):
+    def test_post_create_notifies_followers(self):
+        """Подписанные на автора получают событие после коммита,
+        а ASGI держит поток SSE без рабочего потока."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=reader, author=author)
+        client = Client()
+        client.force_login(reader)
+        cookie = client.cookies['sessionid']
+        handler = AsgiHandler(_no_wsgi, threads=1)
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('posts:follow_events'),
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', f'sessionid={cookie.value}'.encode()),
+            ],
+        }
+        chunks = []
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            disconnect = asyncio.Event()
+            requests = iter([{'type': 'http.request', 'body': b''}])
+
+            async def receive():
+                message = next(requests, None)
+                if message is None:
+                    await disconnect.wait()
+                    message = {'type': 'http.disconnect'}
+                return message
+
+            async def send(message):
+                body = message.get('body', b'')
+                chunks.append(body)
+                if body.startswith(b'retry:'):
+                    author_client = Client()
+                    author_client.force_login(author)
+                    loop.run_in_executor(
+                        None,
+                        author_client.post,
+                        reverse('posts:post_create'),
+                        {'text': 'Свежая запись'},
+                    )
+                if b'event: new_posts' in body:
+                    disconnect.set()
+
+            await asyncio.wait_for(handler(scope, receive, send), 10)
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            asyncio.run(run())
+        post = Post.objects.get()
+        self.assertIn(
+            f'data: {{"count": 1, "latest": {post.pk}}}'.encode(),
+            b''.join(chunks),
+        )
+        self.assertEqual(pubsub.get_backend().channels(), [])
+
+
+class PublishPostTests(SimpleTestCase):
+    def test_message_goes_to_author_channel(self):
+        with pubsub.get_backend().subscribe(['author:7']) as subscription:
+            notifications.publish_post(3, 7)
+            self.assertEqual(
+                subscription.get(0), [{'post_id': 3, 'author_id': 7}]
+            )
@@ -1,16 +1,31 @@
+import os
 import shutil
 import tempfile
 
+from core import query_plans, tasks
+from core.db import replicas
+from core.models import Task
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import search, thumbnails, timeline
 from ..forms import PostForm
-from ..models import Follow, Group, Post
+from ..models import (
+    Comment,
+    Follow,
+    Group,
+    Post,
+    PostCounter,
+    TimelineEntry,
+    UserCounter,
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
@@ -33,6 +48,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -202,6 +218,10 @@ class PostImageTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, 'variants'), ignore_errors=True
+        )
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -220,6 +240,42 @@ class PostImageTest(TestCase):
         )
         self.assertIsNotNone(response.context.get('post').image)
 
+    def test_thumbnails_scheduled_only_for_new_image(self):
+        """Правка текста не ставит миниатюры в очередь заново."""
+        scheduled = Task.objects.filter(name=thumbnails.generate.task_name)
+        before = scheduled.count()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertEqual(scheduled.count(), before)
+        post.image = SimpleUploadedFile(
+            name='other.gif', content=self.small_gif, content_type='image/gif'
+        )
+        post.save()
+        post.save()
+        self.assertEqual(scheduled.count(), before + 1)
+
+    def test_thumbnail_prepared_in_background(self):
+        """Лента не режет картинку сама: до фоновой подготовки
+        показывается оригинал, после нее — миниатюра."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        thumbnails.generate(self.post.image.name)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(response, '<picture>')
+
+    def test_picture_lists_all_widths(self):
+        """Карточка отдает srcset со всеми ширинами картинки."""
+        thumbnails.generate(self.post.image.name)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        self.assertContains(response, 'type="image/jpeg"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            with self.subTest(width=width):
+                self.assertContains(response, f'.jpeg {width}w')
+
 
 class CacheTests(TestCase):
     @classmethod
@@ -232,18 +288,45 @@ class CacheTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_home_index(self):
-        """Тест кэша на главной странице."""
-        init_response = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.get(pk=self.post.id).delete()
+        """Карточка записи берется из кэша, пока запись не менялась."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.id).update(text='Тихая правка.')
         response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(init_response.content, response.content)
+        self.assertContains(response, self.post.text)
         cache.clear()
         clear_response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(clear_response.content, response.content)
+        self.assertContains(clear_response, 'Тихая правка.')
+
+    def test_edited_post_shown_immediately(self):
+        """Правка записи сразу видна во всех лентах."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user.username]),
+        ]
+        for page in pages:
+            self.authorized_client.get(page)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.id]),
+            data={'text': 'Исправленный текст записи.'},
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertContains(response, 'Исправленный текст записи.')
+
+    def test_author_rename_shown_immediately(self):
+        """Новое имя автора сразу видно в карточках."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        self.user.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новое Имя')
 
 
 class FollowTests(TestCase):
@@ -299,6 +382,73 @@ class FollowTests(TestCase):
         )
         self.assertNotIn(post, not_follower_response.context['page_obj'])
 
+    def test_new_post_fanned_out_to_followers(self):
+        """Новая запись раскладывается в ленты подписчиков,
+        а после отписки убирается из них."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(
+            text='Запись для ленты подписок.',
+            author=self.author,
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=post
+            ).exists()
+        )
+        self.authorized_follower.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_merged_on_read(self):
+        """Записи популярного автора не раскладываются по лентам,
+        но попадают в ленту подписок при чтении."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(
+            text='Запись популярного автора.',
+            author=self.author,
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_posts_of_formerly_popular_author_kept(self):
+        """Записи, пропущенные раскладкой, пока автор был популярным,
+        дописываются в ленты, когда подписчиков становится меньше."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(
+            text='Запись популярного автора.',
+            author=self.author,
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        row = tasks.claim(Task.objects.all(), 'test')
+        self.assertEqual(row.name, timeline.backfill_author.task_name)
+        tasks.execute(row)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=post, created=post.created
+            ).exists()
+        )
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_feed_read_by_timeline_index(self):
+        """Лента без популярных авторов читается диапазоном индекса
+        без временной сортировки."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Post.objects.create(text='Запись для ленты.', author=self.author)
+        queryset = timeline.feed_for(self.follower)[:settings.POSTS_PER_PAGE]
+        plan = query_plans.explain(*queryset.query.sql_with_params())
+        self.assertEqual(query_plans.problems(plan), [])
+        self.assertIn('timeline_user_created_idx', ' '.join(plan))
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -348,3 +498,466 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     len(self.posts) - settings.POSTS_PER_PAGE,
                 )
+
+
+@override_settings(
+    CURSOR_PAGINATION_VIEWS=(
+        'posts:index',
+        'posts:group_list',
+        'posts:profile',
+    )
+)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.test_group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = Post.objects.bulk_create(
+            [
+                Post(
+                    text=f'Тестовая запись номер {number}',
+                    author=cls.user,
+                    group=cls.test_group,
+                )
+                for number in range(settings.POSTS_PER_PAGE * 2 - 1)
+            ]
+        )
+        cls.page_names = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.test_group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсор листает ленту вперед и назад без пропусков."""
+        for reverse_name in self.page_names:
+            with self.subTest(reverse_name=reverse_name):
+                first = self.authorized_client.get(reverse_name)
+                first_page = first.context['page_obj']
+                self.assertTrue(first_page.is_cursor)
+                self.assertEqual(len(first_page), settings.POSTS_PER_PAGE)
+                self.assertFalse(first_page.has_previous())
+                second = self.authorized_client.get(
+                    reverse_name, {'cursor': first_page.next_cursor}
+                )
+                second_page = second.context['page_obj']
+                self.assertEqual(
+                    len(second_page),
+                    len(self.posts) - settings.POSTS_PER_PAGE,
+                )
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(
+                    set(first_page.object_list)
+                    & set(second_page.object_list)
+                )
+                back = self.authorized_client.get(
+                    reverse_name, {'cursor': second_page.previous_cursor}
+                )
+                self.assertEqual(
+                    back.context['page_obj'].object_list,
+                    first_page.object_list,
+                )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), settings.POSTS_PER_PAGE
+        )
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.post = Post.objects.create(
+            text='Запись для тестирования счетчиков.',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_follower = Client()
+        self.authorized_follower.force_login(self.follower)
+
+    def test_profile_counters_follow_changes(self):
+        """Счетчики профиля меняются вместе с записями и подписками."""
+        profile_url = reverse('posts:profile', args=[self.author.username])
+        counters = self.authorized_follower.get(profile_url).context[
+            'counters'
+        ]
+        self.assertEqual(counters.posts_count, 1)
+        self.assertEqual(counters.followers_count, 0)
+        Post.objects.create(text='Еще одна запись', author=self.author)
+        self.authorized_follower.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        counters = self.authorized_follower.get(profile_url).context[
+            'counters'
+        ]
+        self.assertEqual(counters.posts_count, 2)
+        self.assertEqual(counters.followers_count, 1)
+        self.authorized_follower.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        counters = self.authorized_follower.get(profile_url).context[
+            'counters'
+        ]
+        self.assertEqual(counters.followers_count, 0)
+
+    def test_comment_counter_follows_comments(self):
+        """Счетчик комментариев растет после add_comment."""
+        detail_url = reverse('posts:post_detail', args=[self.post.id])
+        self.authorized_follower.get(detail_url)
+        self.authorized_follower.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            data={'text': 'Комментарий'},
+        )
+        response = self.authorized_follower.get(detail_url)
+        self.assertEqual(
+            response.context['post_counters'].comments_count, 1
+        )
+
+    def test_pages_do_not_create_counters(self):
+        """Просмотр страниц без строк счетчиков ничего не пишет в базу
+        и не закрепляет клиента за основной базой."""
+        UserCounter.objects.all().delete()
+        PostCounter.objects.all().delete()
+        for url in (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertFalse(UserCounter.objects.exists())
+        self.assertFalse(PostCounter.objects.exists())
+
+    def test_counters_created_with_objects(self):
+        """Строки счетчиков заводятся вместе с пользователем и записью."""
+        self.assertTrue(
+            UserCounter.objects.filter(user=self.follower).exists()
+        )
+        self.assertTrue(PostCounter.objects.filter(post=self.post).exists())
+
+
+class PostDetailQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.test_group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Популярная запись',
+            author=cls.user,
+            group=cls.test_group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_query_count_does_not_depend_on_comments(self):
+        """Число запросов к странице записи не зависит
+        от числа комментариев."""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.authorized_client.get(url)
+        query_counts = []
+        for total in (1, 10, 1000):
+            Comment.objects.bulk_create(
+                [
+                    Comment(post=self.post, author=self.user, text='Текст')
+                    for _ in range(total - self.post.comments.count())
+                ]
+            )
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url)
+            self.assertLessEqual(
+                len(response.context['comments']),
+                settings.COMMENTS_PER_PAGE,
+            )
+            query_counts.append(len(queries))
+        self.assertEqual(len(set(query_counts)), 1, query_counts)
+
+    def test_comments_loaded_by_cursor(self):
+        """Страница записи показывает первую страницу комментариев,
+        остальные подгружаются фрагментами по курсору."""
+        Comment.objects.bulk_create(
+            [
+                Comment(post=self.post, author=self.user, text=f'К{number}')
+                for number in range(settings.COMMENTS_PER_PAGE + 5)
+            ]
+        )
+        cache.clear()
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        fragment_url = reverse('posts:post_comments', args=[self.post.id])
+        self.assertContains(
+            response, f'{fragment_url}?cursor={comments.next_cursor}'
+        )
+        response = self.authorized_client.get(
+            fragment_url, {'cursor': comments.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(len(response.context['comments']), 5)
+        self.assertFalse(response.context['comments'].has_next())
+        response = self.authorized_client.get(
+            reverse('posts:post_comments', args=[self.post.id + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Рецепт <b>пирога</b> с вишней',
+            author=cls.user,
+        )
+        cls.other_post = Post.objects.create(
+            text='Заметки о путешествии',
+            author=cls.user,
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.other_post,
+            author=cls.user,
+            text='А пирог из вишни вкуснее всего',
+        )
+
+    def test_search_finds_posts_and_comments(self):
+        """Поиск находит записи и комментарии, подсвечивая совпадения."""
+        response = self.client.get(reverse('posts:search'), {'q': 'вишн'})
+        results = response.context['results']
+        self.assertEqual(
+            {(result.post, result.comment) for result in results},
+            {(self.post, None), (self.other_post, self.comment)},
+        )
+        self.assertContains(response, '<mark>вишней</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при правке записи."""
+        self.post.text = 'Рецепт торта'
+        self.post.save()
+        response = self.client.get(reverse('posts:search'), {'q': 'пирога'})
+        self.assertEqual(response.context['results'], [])
+
+    def test_results_paginated_with_cursor(self):
+        """Выдача листается курсором без повторов."""
+        Post.objects.bulk_create(
+            [Post(text='Общее слово', author=self.user) for _ in range(3)]
+        )
+        search.get_backend().rebuild()
+        seen = []
+        cursor = None
+        while True:
+            page = search.get_backend().search('общее', cursor, limit=2)
+            seen += [result.post.pk for result in page.results]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+
+    @override_settings(SEARCH_BACKEND='posts.search.SimpleBackend')
+    def test_simple_backend(self):
+        """Запасной бэкенд ищет по записям и их комментариям."""
+        response = self.client.get(reverse('posts:search'), {'q': 'вишн'})
+        self.assertEqual(
+            {result.post for result in response.context['results']},
+            {self.post, self.other_post},
+        )
+
+
+class ConditionalResponseTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Запись', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def _revalidate(self, client, url):
+        # Первый ответ страницы с формой выдает cookie csrftoken,
+        # от которой тоже зависит ETag.
+        client.get(url)
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_not_modified(self):
+        """Неизменившаяся страница отдается как 304 без рендера."""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ):
+            with self.subTest(url=url):
+                response = self._revalidate(self.reader_client, url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_new_post_changes_feed(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_post_page(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            text='Ответ', author=self.reader, post=self.post
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_group_rename_changes_post_page(self):
+        group = Group.objects.create(title='Старая', slug='renamed')
+        post = Post.objects.create(
+            text='Запись группы', author=self.author, group=group
+        )
+        url = reverse('posts:post_detail', args=[post.pk])
+        etag = self.client.get(url)['ETag']
+        group.title = 'Новая'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новая')
+
+    def test_commenter_rename_changes_post_page(self):
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(text='Ответ', author=commenter, post=self.post)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        commenter.username = 'renamed_commenter'
+        commenter.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'renamed_commenter')
+
+    def test_follow_changes_profile(self):
+        """Подписка меняет кнопку и счетчики профиля."""
+        url = reverse('posts:profile', args=[self.author.username])
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_viewer_is_part_of_etag(self):
+        """Аноним не получает 304 на страницу вошедшего пользователя."""
+        url = reverse('posts:index')
+        etag = self.reader_client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_control(self):
+        """Анонимам страница кэшируется публично, вошедшим - приватно."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=30', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.reader_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Запись', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_anonymous_page_from_cache(self):
+        """Повторный запрос анонима отдается без рендера страницы."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertTemplateNotUsed(second, 'posts/index.html')
+        self.assertEqual(first.content, second.content)
+        self.assertNotContains(second, '<!--hole:')
+
+    def test_holes_filled_for_viewer(self):
+        """Вошедший получает страницу анонима со своими фрагментами."""
+        url = reverse('posts:profile', args=[self.author.username])
+        anonymous = self.client.get(url)
+        self.assertNotContains(anonymous, 'Подписаться')
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'reader')
+        self.assertContains(response, 'Подписаться')
+
+    def test_comment_form_filled_for_viewer(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertContains(
+            response, reverse('posts:add_comment', args=[self.post.pk])
+        )
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, 'Редактировать запись')
+
+    def test_new_post_invalidates_page(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(text='Новая запись', author=self.author)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новая запись')
+
+    def test_group_rename_invalidates_post_page(self):
+        """Страница записи из кэша не показывает старое имя группы."""
+        group = Group.objects.create(title='Старая группа', slug='cached')
+        post = Post.objects.create(
+            text='Запись группы', author=self.author, group=group
+        )
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.client.get(url)
+        self.assertTemplateNotUsed(
+            self.client.get(url), 'posts/post_detail.html'
+        )
+        group.title = 'Новая группа'
+        group.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Новая группа')
+        self.assertNotContains(response, 'Старая группа')
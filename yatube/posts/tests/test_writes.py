@@ -0,0 +1,110 @@
+import shutil
+import tempfile
+
+from core import journal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    WRITE_BEHIND=True, WRITE_BEHIND_DIR=TEMP_DIR, WRITE_BEHIND_INTERVAL=None
+)
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(text='Запись', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        journal.flush()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_comment_visible_to_writer_before_flush(self):
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.author_client.get(url)
+        response = self.reader_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Отложенный комментарий'},
+        )
+        self.assertRedirects(response, url)
+        self.assertFalse(Comment.objects.exists())
+        self.assertContains(
+            self.reader_client.get(url), 'Отложенный комментарий'
+        )
+        self.assertNotContains(
+            self.author_client.get(url), 'Отложенный комментарий'
+        )
+        journal.flush()
+        self.assertEqual(Comment.objects.get().author, self.reader)
+        self.assertContains(
+            self.reader_client.get(url), 'Отложенный комментарий', count=1
+        )
+        self.assertContains(
+            self.author_client.get(url), 'Отложенный комментарий'
+        )
+
+    def test_follow_and_unfollow_applied_in_order(self):
+        profile = reverse('posts:profile', args=[self.author.username])
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.assertContains(self.reader_client.get(profile), 'Отписаться')
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        journal.flush()
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+            .exists()
+        )
+        self.assertContains(self.reader_client.get(profile), 'Отписаться')
+
+    def test_pending_write_not_hidden_by_etag(self):
+        """Повтор GET со старым ETag после своей записи отдает страницу
+        с ней, а не 304."""
+        pages = [
+            (
+                reverse('posts:post_detail', args=[self.post.pk]),
+                reverse('posts:add_comment', args=[self.post.pk]),
+                {'text': 'Свой комментарий'},
+                'Свой комментарий',
+            ),
+            (
+                reverse('posts:profile', args=[self.author.username]),
+                reverse('posts:profile_follow', args=[self.author.username]),
+                {},
+                'Отписаться',
+            ),
+        ]
+        for url, write_url, data, expected in pages:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.reader_client.post(write_url, data)
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertContains(response, expected)
@@ -0,0 +1,88 @@
+"""Фоновая подготовка миниатюр картинок записей.
+
+После сохранения записи все размеры из POST_THUMBNAIL_SIZES готовятся
+задачей в очереди core.tasks. Бэкенд DeferredThumbnailBackend не режет
+картинку внутри запроса: пока миниатюры нет, шаблон получает оригинал,
+а миниатюра ставится в очередь не чаще раза в TASK_LOCK_TIMEOUT.
+"""
+from core import tasks
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cards, freshness, variants
+from .models import Post
+
+SCHEDULED_KEY = 'thumbnails:scheduled:{name}:{geometry}'
+
+
+@tasks.task(queue='thumbnails')
+def generate(image_name, sizes=None):
+    """Готовит миниатюры и адаптивные варианты картинки
+    и обновляет карточки ее записей.
+    """
+    backend = ThumbnailBackend()
+    for geometry, options in (sizes or settings.POST_THUMBNAIL_SIZES):
+        backend.get_thumbnail(image_name, geometry, **options)
+    if sizes is None:
+        variants.generate(image_name)
+    for pk in Post.objects.filter(image=image_name).values_list(
+        'pk', flat=True
+    ):
+        cards.invalidate('post', pk)
+        freshness.touch('posts', f'post:{pk}')
+
+
+def _source_exists(image_name):
+    try:
+        return default_storage.exists(image_name)
+    except SuspiciousFileOperation:
+        return False
+
+
+def schedule(image_name, sizes=None):
+    """Ставит подготовку миниатюр в очередь задач."""
+    if _source_exists(image_name):
+        tasks.enqueue(generate, image_name, sizes)
+
+
+def wait(timeout=None):
+    """Дожидается задач, которые выполняет пул веб-процесса."""
+    tasks.wait(timeout)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Отдает готовую миниатюру или оригинал, не блокируя запрос."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        full_options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            full_options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            full_options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                full_options.setdefault(key, value)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, full_options
+        )
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        if cache.add(
+            SCHEDULED_KEY.format(name=source.name, geometry=name),
+            True,
+            settings.TASK_LOCK_TIMEOUT,
+        ):
+            schedule(source.name, [(geometry_string, options)])
+        return ImageFile(source.name, default.storage)
@@ -0,0 +1,179 @@
+"""Лента подписок, материализованная при записи (fan-out on write).
+
+Новая запись автора раскладывается в TimelineEntry каждого подписчика
+вместе с датой записи, поэтому чтение ленты сводится к выборке
+по индексу (user, -created, -post). Записи авторов, у которых
+в UserCounter не меньше TIMELINE_FANOUT_LIMIT подписчиков,
+не раскладываются, а подмешиваются к ленте при чтении. Когда автор
+опускается ниже порога, пропущенные записи дописываются в ленты
+его подписчиков фоновой задачей.
+"""
+from core import tasks
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q
+
+from . import counters
+from .models import Follow, Post, TimelineEntry, UserCounter
+
+
+def _is_popular(author):
+    """Проверяет, читается ли автор при чтении, а не при записи."""
+    return (
+        counters.for_user(author).followers_count
+        >= settings.TIMELINE_FANOUT_LIMIT
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новую запись в ленты подписчиков автора."""
+    if _is_popular(post.author):
+        return
+    follower_ids = Follow.objects.filter(author=post.author).values_list(
+        'user_id', flat=True
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in follower_ids
+            if user_id is not None
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _add_posts(user_ids, author_id):
+    """Дописывает записи автора в ленты пользователей."""
+    posts = list(
+        Post.objects.filter(author_id=author_id).values_list('id', 'created')
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+            for user_id in user_ids
+            for post_id, created in posts
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user, author):
+    """Добавляет записи автора в ленту нового подписчика."""
+    if not _is_popular(author):
+        _add_posts([user.pk], author.pk)
+
+
+def remove_author(user, author):
+    """Убирает записи автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def author_unfollowed(author_id):
+    """Ставит дозапись лент, если автор только что перестал быть
+    популярным: его записи больше не подмешиваются при чтении."""
+    if UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT - 1,
+    ).exists():
+        tasks.enqueue(backfill_author, author_id)
+
+
+@tasks.task()
+def backfill_author(author_id):
+    """Дописывает записи автора в ленты всех его подписчиков."""
+    if UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists():
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=author_id, user__isnull=False)
+        .values_list('user_id', flat=True)
+    )
+    _add_posts(follower_ids, author_id)
+
+
+def rebuild(user):
+    """Заново собирает ленту пользователя по его подпискам."""
+    TimelineEntry.objects.filter(user=user).delete()
+    for follow in Follow.objects.filter(user=user).select_related('author'):
+        add_author(user, follow.author)
+
+
+def _sync_popular_counters():
+    """Пересчитывает счетчики авторов, популярных по таблице подписок
+    или по UserCounter, чтобы ленты и чтение делили их одинаково."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    author_ids = set(
+        Follow.objects.filter(author__isnull=False)
+        .values('author_id')
+        .annotate(followers=Count('id'))
+        .filter(followers__gte=limit)
+        .values_list('author_id', flat=True)
+    )
+    author_ids.update(
+        UserCounter.objects.filter(followers_count__gte=limit)
+        .values_list('user_id', flat=True)
+    )
+    for author_id in author_ids:
+        UserCounter.objects.update_or_create(
+            user_id=author_id,
+            defaults=counters.exact_user_counts(author_id),
+        )
+
+
+def rebuild_all():
+    """Заново собирает ленты всех пользователей одним запросом."""
+    timeline_table = TimelineEntry._meta.db_table
+    follow_table = Follow._meta.db_table
+    post_table = Post._meta.db_table
+    counter_table = UserCounter._meta.db_table
+    _sync_popular_counters()
+    TimelineEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {timeline_table} (user_id, post_id, created) '
+            f'SELECT f.user_id, p.id, p.created FROM {follow_table} f '
+            f'JOIN {post_table} p ON p.author_id = f.author_id '
+            f'WHERE f.user_id IS NOT NULL AND f.author_id NOT IN ('
+            f' SELECT user_id FROM {counter_table}'
+            f' WHERE followers_count >= %s)',
+            [settings.TIMELINE_FANOUT_LIMIT],
+        )
+
+
+def popular_authors(user):
+    """id авторов из подписок пользователя, которые читаются при чтении."""
+    return list(
+        UserCounter.objects.filter(
+            user_id__in=Follow.objects.filter(user=user).values('author_id'),
+            followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id', flat=True)
+    )
+
+
+def feed_for(user):
+    """Возвращает записи ленты подписок пользователя.
+
+    Без популярных авторов лента читается диапазоном индекса
+    TimelineEntry; ключ курсора берется из аннотаций cursor_created
+    и cursor_pk. С ними записи ленты и популярных авторов читаются
+    вместе по индексу дат записей.
+    """
+    posts = Post.objects.select_related('author', 'group')
+    popular = popular_authors(user)
+    if popular:
+        fanned_out = TimelineEntry.objects.filter(user=user).values('post')
+        return posts.filter(
+            Q(pk__in=fanned_out) | Q(author_id__in=popular)
+        ).order_by('-created', '-pk')
+    return (
+        posts.filter(timeline_entries__user=user)
+        .annotate(
+            cursor_created=F('timeline_entries__created'),
+            cursor_pk=F('timeline_entries__post'),
+        )
+        .order_by('-cursor_created', '-cursor_pk')
+    )
@@ -0,0 +1,91 @@
+"""Потоковый перенос данных в формате NDJSON.
+
+Каждая строка - объект {"model": ..., "pk": ..., "fields": {...}}
+в формате сериализатора Django, внешние ключи записаны id. Модели
+идут в порядке зависимостей, поэтому при загрузке каждая строка
+ссылается только на уже загруженные.
+"""
+import gzip
+import json
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+MODELS = (
+    'auth.user',
+    'posts.group',
+    'posts.post',
+    'posts.comment',
+    'posts.follow',
+)
+
+
+def open_file(path, mode):
+    """Открывает файл, сжатые .gz - прозрачно."""
+    opener = gzip.open if path.endswith('.gz') else open
+    return opener(path, mode + 't', encoding='utf-8')
+
+
+def _fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+
+
+def dump_rows(model, batch_size):
+    """Строки NDJSON для всех объектов модели по возрастанию pk."""
+    label = model._meta.label_lower
+    fields = _fields(model)
+    names = ['pk'] + [field.attname for field in fields]
+    rows = model._default_manager.order_by('pk').values_list(*names)
+    for row in rows.iterator(chunk_size=batch_size):
+        yield json.dumps(
+            {
+                'model': label,
+                'pk': row[0],
+                'fields': {
+                    field.name: value
+                    for field, value in zip(fields, row[1:])
+                },
+            },
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        )
+
+
+def load_row(line):
+    """Собирает несохраненный объект из строки NDJSON."""
+    data = json.loads(line)
+    model = apps.get_model(data['model'])
+    values = {}
+    for field in _fields(model):
+        if field.name in data['fields']:
+            values[field.attname] = field.to_python(
+                data['fields'][field.name]
+            )
+    return model(pk=data['pk'], **values)
+
+
+@contextmanager
+def original_dates(model, objects):
+    """Сохраняет даты из выгрузки: на время загрузки выключает
+    auto_now_add, иначе bulk_create проставил бы текущее время.
+    Объектам без даты в выгрузке ставится текущее время."""
+    fields = [
+        field for field in _fields(model)
+        if getattr(field, 'auto_now_add', False)
+    ]
+    now = timezone.now()
+    for field in fields:
+        field.auto_now_add = False
+        for obj in objects:
+            if getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, now)
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
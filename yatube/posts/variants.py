@@ -0,0 +1,116 @@
+"""Адаптивные варианты картинок записей.
+
+Для каждой картинки готовятся копии нескольких ширин в современных
+форматах (AVIF и WebP, если их умеет собранный Pillow) и в JPEG.
+Список готовых файлов хранится в manifest.json рядом с ними и в кэше;
+по нему шаблон строит <picture> со srcset.
+"""
+import hashlib
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+CACHE_KEY = 'image_variants:{digest}'
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        fmt for fmt in settings.POST_IMAGE_FORMATS
+        if fmt.upper() in Image.SAVE
+    ]
+
+
+def _directory(image_name):
+    digest = hashlib.sha1(image_name.encode()).hexdigest()
+    return digest, f'variants/{digest[:2]}/{digest}'
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(content))
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        fmt.upper(),
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=fmt == 'jpeg',
+    )
+    return buffer.getvalue()
+
+
+def generate(image_name):
+    """Готовит все варианты картинки и возвращает их описание."""
+    digest, directory = _directory(image_name)
+    ratio = settings.POST_IMAGE_ASPECT[1] / settings.POST_IMAGE_ASPECT[0]
+    with default_storage.open(image_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    manifest = {fmt: [] for fmt in supported_formats()}
+    for width in settings.POST_IMAGE_WIDTHS:
+        resized = ImageOps.fit(
+            image, (width, round(width * ratio)), Image.LANCZOS
+        )
+        for fmt in manifest:
+            name = _save(
+                f'{directory}/{width}.{fmt}', _encode(resized, fmt)
+            )
+            manifest[fmt].append({'width': width, 'name': name})
+    _save(f'{directory}/manifest.json', json.dumps(manifest).encode())
+    cache.set(CACHE_KEY.format(digest=digest), manifest, None)
+    return manifest
+
+
+def lookup(image_name):
+    """Возвращает описание готовых вариантов или None."""
+    digest, directory = _directory(image_name)
+    key = CACHE_KEY.format(digest=digest)
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest_name = f'{directory}/manifest.json'
+        if not default_storage.exists(manifest_name):
+            return None
+        with default_storage.open(manifest_name) as manifest_file:
+            manifest = json.loads(manifest_file.read())
+        cache.set(key, manifest, None)
+    return manifest
+
+
+def picture(image_name):
+    """Собирает источники для тега <picture>."""
+    manifest = lookup(image_name)
+    if not manifest:
+        return None
+    sources = [
+        {
+            'type': MIME_TYPES[fmt],
+            'srcset': ', '.join(
+                f'{default_storage.url(item["name"])} {item["width"]}w'
+                for item in items
+            ),
+        }
+        for fmt, items in manifest.items()
+    ]
+    fallback = manifest.get('jpeg') or next(iter(manifest.values()))
+    return {
+        'sources': sources,
+        'src': default_storage.url(fallback[-1]['name']),
+        'sizes': settings.POST_IMAGE_SIZES_ATTR,
+    }
@@ -1,22 +1,75 @@
+from core import journal
+from core.asgi import (
+    AsyncStreamingResponse,
+    async_variant,
+    load_user,
+    run_sync,
+)
+from core.paginator import CursorPaginator, EstimatedCountPaginator
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 
+from . import counters, notifications, search, timeline, writes
+from .freshness import conditional_page
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Group, Post
 
 User = get_user_model()
 
 
 def _create_page_obj(request, post_set):
-    """Создает коллекцию постов для пагинатора."""
-    paginator = Paginator(post_set, settings.POSTS_PER_PAGE)
+    """Создает коллекцию постов для пагинатора.
+
+    Ленты из CURSOR_PAGINATION_VIEWS, а также любой запрос с параметром
+    cursor, листаются по курсору (created, id) вместо номера страницы.
+    Остальные не считают COUNT(*) по большим выборкам при каждом запросе.
+    """
+    view_name = request.resolver_match.view_name
+    if (
+        view_name in settings.CURSOR_PAGINATION_VIEWS
+        or 'cursor' in request.GET
+    ):
+        paginator = CursorPaginator(post_set, settings.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = EstimatedCountPaginator(post_set, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
+def _group_scopes(slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return None if pk is None else ['posts', f'group:{pk}']
+
+
+def _profile_scopes(username):
+    pk = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return None if pk is None else ['posts', f'user:{pk}']
+
+
+def _post_scopes(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if row is None:
+        return None
+    author_id, group_id = row
+    scopes = [f'post:{post_id}', f'user:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+@conditional_page(lambda: ['posts'])
 def index(request):
     """Обрабатывает главную страницу."""
     post_set = Post.objects.select_related('group', 'author').all()
@@ -29,6 +82,7 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(_group_scopes)
 def group_posts(request, slug):
     """Обрабатывает страницу с фильтрацией постов по группе."""
     group = get_object_or_404(Group, slug=slug)
@@ -41,35 +95,63 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(_profile_scopes)
 def profile(request, username):
     """Обрабатывает страницу автора."""
     author = get_object_or_404(User, username=username)
     post_set = author.posts.select_related('group')
     page_obj = _create_page_obj(request, post_set)
-    following = Follow.objects.filter(
-        author=author.id, user=request.user.id
-    ).exists()
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'counters': counters.for_user(author),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def _comments_page(request, post_id):
+    """Страница комментариев по курсору (created, id).
+
+    Читается по индексу comment_post_created_idx одним запросом
+    на COMMENTS_PER_PAGE + 1 строк, сколько бы комментариев ни было.
+    """
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@conditional_page(_post_scopes)
 def post_detail(request, post_id):
     """Обрабатывает страницу опубликованного поста."""
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': _comments_page(request, post.pk),
+        'author_counters': counters.for_user(post.author),
+        'post_counters': counters.for_post(post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_page(_post_scopes)
+def post_comments(request, post_id):
+    """Следующая страница комментариев HTML-фрагментом для подгрузки
+    на странице записи."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return render(
+        request,
+        'posts/includes/comment_list.html',
+        {'comments': _comments_page(request, post_id), 'post_id': post_id},
+    )
+
+
 @login_required
 def post_create(request):
     """Обрабатывает страницу и форму создания поста."""
@@ -113,10 +195,12 @@ def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        journal.submit(
+            writes.add_comment,
+            request.user.pk,
+            post_id=post.pk,
+            text=form.cleaned_data['text'],
+        )
         return redirect('posts:post_detail', post_id=post_id)
     return render(request, 'posts/create_post.html', context={"form": form})
 
@@ -124,7 +208,7 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     """Обрабатывает страницу с фильтрацией постов по подпискам."""
-    post_set = Post.objects.filter(author__following__user=request.user).all()
+    post_set = timeline.feed_for(request.user)
     page_obj = _create_page_obj(request, post_set)
     context = {
         'page_obj': page_obj,
@@ -134,12 +218,102 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def _events_params(request):
+    """Последняя увиденная запись и срок ожидания long-poll."""
+    since = notifications.parse_since(
+        request.GET.get('since', request.META.get('HTTP_LAST_EVENT_ID'))
+    )
+    try:
+        timeout = float(request.GET.get('timeout', settings.LONG_POLL_TIMEOUT))
+    except ValueError:
+        timeout = settings.LONG_POLL_TIMEOUT
+    return since, min(max(timeout, 0), settings.LONG_POLL_TIMEOUT)
+
+
+def _event_stream(content, response_class, new_posts):
+    response = response_class(content, content_type='text/event-stream')
+    # Ответ закрывают и сервер WSGI, и AsgiHandler, даже если тело
+    # так и не прочитали (HEAD, обрыв до первого куска).
+    response._closable_objects.append(new_posts)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _open_new_posts(request):
+    user = await run_sync(request, load_user, request)
+    if not user.is_authenticated:
+        return None
+    since, _ = _events_params(request)
+    return await run_sync(
+        request, notifications.open_new_posts, user, since
+    )
+
+
+async def follow_events_async(request):
+    """Асинхронный вариант follow_events: поток без срока и без потока
+    ОС на соединение."""
+    new_posts = await _open_new_posts(request)
+    if new_posts is None:
+        return HttpResponse(status=401)
+    return _event_stream(
+        notifications.astream(new_posts), AsyncStreamingResponse, new_posts
+    )
+
+
+@async_variant(follow_events_async)
+def follow_events(request):
+    """SSE о новых записях авторов из подписок.
+
+    Под WSGI соединение держит рабочий поток, поэтому поток обрывается
+    через LONG_POLL_TIMEOUT секунд и браузер переподключается
+    с Last-Event-ID. Под ASGI выполняется follow_events_async.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponse(status=401)
+    since, _ = _events_params(request)
+    new_posts = notifications.NewPosts(request.user, since)
+    return _event_stream(
+        notifications.stream(new_posts, settings.LONG_POLL_TIMEOUT),
+        StreamingHttpResponse,
+        new_posts,
+    )
+
+
+async def follow_events_poll_async(request):
+    """Асинхронный вариант follow_events_poll."""
+    new_posts = await _open_new_posts(request)
+    if new_posts is None:
+        return HttpResponse(status=401)
+    _, timeout = _events_params(request)
+    try:
+        data = await notifications.await_new(new_posts, timeout)
+    finally:
+        new_posts.close()
+    return JsonResponse(data)
+
+
+@async_variant(follow_events_poll_async)
+def follow_events_poll(request):
+    """Long-poll для браузеров без EventSource: ждет новую запись
+    не дольше timeout секунд и отдает {"count", "latest"}."""
+    if not request.user.is_authenticated:
+        return HttpResponse(status=401)
+    since, timeout = _events_params(request)
+    new_posts = notifications.NewPosts(request.user, since)
+    try:
+        data = notifications.wait(new_posts, timeout)
+    finally:
+        new_posts.close()
+    return JsonResponse(data)
+
+
 @login_required
 def profile_follow(request, username):
     """Обрабатывает подписку на пользователя."""
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        journal.submit(writes.follow, request.user.pk, author_id=author.pk)
     return redirect('posts:profile', username=author.username)
 
 
@@ -147,9 +321,17 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Обрабатывает отписку от пользователя."""
     author = get_object_or_404(User, username=username)
-    subscribe = Follow.objects.filter(
-        author=author.id, user=request.user.id
-    ).all()
-    if subscribe.exists():
-        subscribe.delete()
+    journal.submit(writes.unfollow, request.user.pk, author_id=author.pk)
     return redirect('posts:profile', username=author.username)
+
+
+def search_posts(request):
+    """Обрабатывает страницу поиска по записям и комментариям."""
+    query = request.GET.get('q', '').strip()
+    page = search.get_backend().search(query, request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'results': page.results,
+        'next_cursor': page.next_cursor,
+    }
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,60 @@
+"""Комментарии и подписки, которые можно писать через журнал.
+
+Представления вызывают операции через journal.submit: без WRITE_BEHIND
+они выполняются сразу, с ним - пачкой в фоне. Операции повторно
+проверяют, что запись и автор еще существуют; от повторного
+применения после падения журнал защищает сам.
+Пока операция в журнале, ее автор видит результат через pending_*.
+"""
+from datetime import datetime, timezone
+
+from core import journal
+from django.contrib.auth import get_user_model
+
+from .models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@journal.operation('comment')
+def add_comment(user_id, post_id, text):
+    if Post.objects.filter(pk=post_id).exists():
+        Comment.objects.create(post_id=post_id, author_id=user_id, text=text)
+
+
+@journal.operation('follow')
+def follow(user_id, author_id):
+    # Сигналы Follow обращаются к user и author, поэтому оба
+    # загружаются одним запросом.
+    users = User.objects.in_bulk([user_id, author_id])
+    if author_id in users:
+        Follow.objects.get_or_create(
+            user=users[user_id], author=users[author_id]
+        )
+
+
+@journal.operation('unfollow')
+def unfollow(user_id, author_id):
+    Follow.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pending_comments(user, post_id):
+    """Несохраненные комментарии пользователя к записи, новые первыми."""
+    return [
+        Comment(
+            post_id=post_id,
+            author=user,
+            text=entry['data']['text'],
+            created=datetime.fromtimestamp(entry['time'], tz=timezone.utc),
+        )
+        for entry in reversed(journal.pending(user.pk, add_comment))
+        if entry['data']['post_id'] == post_id
+    ]
+
+
+def pending_following(user_id, author_id, following):
+    """Подписка с учетом подписок и отписок, ждущих в журнале."""
+    for entry in journal.pending(user_id, follow, unfollow):
+        if entry['data']['author_id'] == author_id:
+            following = entry['operation'] == follow.operation_name
+    return following
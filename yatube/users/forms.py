@@ -1,5 +1,7 @@
-from django.contrib.auth import get_user_model
+from core import mail, tasks
+from django.contrib.auth import forms, get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from django.template import loader
 
 User = get_user_model()
 
@@ -8,3 +10,23 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class PasswordResetForm(forms.PasswordResetForm):
+    """Письмо со ссылкой сброса уходит из очереди задач, а не из запроса."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        html = None
+        if html_email_template_name is not None:
+            html = loader.render_to_string(html_email_template_name, context)
+        tasks.enqueue(
+            mail.send_mail,
+            ''.join(subject.splitlines()),
+            loader.render_to_string(email_template_name, context),
+            from_email,
+            [to_email],
+            html,
+        )
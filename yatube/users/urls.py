@@ -11,6 +11,7 @@ from django.contrib.auth.views import (
 from django.urls import path
 
 from . import views
+from .forms import PasswordResetForm
 
 app_name = 'users'
 
@@ -43,7 +44,8 @@ urlpatterns = [
     path(
         'password_reset/',
         PasswordResetView.as_view(
-            template_name='users/password_reset_form.html'
+            form_class=PasswordResetForm,
+            template_name='users/password_reset_form.html',
         ),
         name='password_reset',
     ),
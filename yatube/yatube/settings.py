@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -50,11 +51,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db.replicas.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +67,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -80,18 +83,94 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Адаптер ASGI из core.asgi: обычные представления идут в пул из
+# ASGI_THREADS потоков, представления с асинхронным вариантом
+# выполняются в цикле событий.
+ASGI_APPLICATION = 'yatube.asgi.application'
+ASGI_THREADS = int(os.environ.get('YATUBE_ASGI_THREADS', 16))
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+# Профиль базы выбирается переменной YATUBE_DB_PROFILE. Соединения
+# постоянные: каждый поток воркера держит одно соединение, поэтому
+# для PostgreSQL max_connections должен покрывать воркеры * потоки
+# (или перед базой стоит pgbouncer). CONN_HEALTH_CHECKS проверяет
+# соединение перед запросом, см. core.db.
+DATABASE_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'sqlite')
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # busy_timeout в секундах: писатели ждут друг друга,
+            # а не падают с "database is locked".
+            'timeout': 20,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'temp_store': 'MEMORY',
+                'cache_size': -64000,
+                'mmap_size': 268435456,
+            },
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'yatube'),
+        'USER': os.environ.get('POSTGRES_USER', 'yatube'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    },
+}
+DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
 }
 
+# Реплики для чтения: YATUBE_DB_REPLICAS перечисляет через запятую
+# файлы SQLite или хосты PostgreSQL. Ленты и страница записи читают
+# с реплик, записавший клиент REPLICA_PIN_SECONDS читает из default.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(','))
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME' if DATABASE_PROFILE == 'sqlite' else 'HOST': location,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.db.replicas.ReplicaRouter']
+REPLICA_READ_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'api:v1:post_list',
+    'api:v1:group_posts',
+    'api:v1:profile',
+    'api:v1:post_detail',
+    'api:v1:post_comments',
+)
+REPLICA_PIN_SECONDS = 10
+
+
+# Полнотекстовый поиск: FTS5 на SQLite, icontains на остальных СУБД.
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+else:
+    SEARCH_BACKEND = 'posts.search.SimpleBackend'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +217,29 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Constants
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+SEARCH_RESULTS_PER_PAGE = 10
+# Выборки больше этого лимита не считаются COUNT(*) внутри запроса:
+# их размер берется из кэша и пересчитывается в фоне раз в таймаут.
+PAGINATOR_EXACT_COUNT_LIMIT = 10000
+PAGINATOR_COUNT_TIMEOUT = 60 * 5
+# Ленты, которые листаются по курсору вместо номера страницы:
+# 'posts:index', 'posts:group_list', 'posts:profile', 'posts:follow_index'.
+CURSOR_PAGINATION_VIEWS = ()
+# Записи авторов с таким числом подписчиков не раскладываются по лентам,
+# а подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Метрики страниц: доля замеряемых запросов, порог повторов одного SQL
+# для предупреждения об N+1 и токен страницы /metrics/: сборщик шлет его
+# в заголовке Authorization: Bearer. Без токена страница закрыта.
+REQUEST_METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('YATUBE_METRICS_SAMPLE_RATE', 1.0)),
+    'DUPLICATE_THRESHOLD': 3,
+    'SERVER_TIMING': DEBUG,
+    'TOKEN': os.environ.get('YATUBE_METRICS_TOKEN', ''),
+}
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -146,9 +248,114 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кэш: 'locmem' живет в памяти одного процесса, 'file' и 'redis' общие
+# для всех воркеров. Смена CACHE_VERSION разом делает старые ключи мертвыми.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE_BACKEND', 'locmem')
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'core.cache.LocMemCache',
+    },
+    'file': {
+        'BACKEND': 'core.cache.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+    'redis': {
+        'BACKEND': 'core.cache.RedisCache',
+        'LOCATION': os.environ.get('YATUBE_REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    },
+}
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        'KEY_PREFIX': 'yatube',
+        'VERSION': int(os.environ.get('YATUBE_CACHE_VERSION', 1)),
     }
 }
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+# Сколько секунд прокси и браузер могут отдавать анонимам страницу
+# без перепроверки. Вошедшим страницы отдаются с private, no-cache
+# и перепроверяются по ETag.
+HTTP_CACHE_MAX_AGE = {
+    'index': 30,
+    'group_list': 60,
+    'profile': 60,
+    'post_detail': 60,
+    'post_comments': 60,
+}
+# Массивы подписок пользователя в кэше (posts.graph) сбрасываются
+# сигналами; срок только вытесняет массивы неактивных пользователей.
+FOLLOW_GRAPH_TIMEOUT = 60 * 60 * 24
+
+# Long-poll /api/v1/changes/: сколько ждать изменения области
+# и как часто перечитывать ее версию, с.
+LONG_POLL_TIMEOUT = 25
+LONG_POLL_INTERVAL = 0.5
+
+# Публикация событий (core.pubsub). LocalPubSub раздает события внутри
+# процесса; при нескольких воркерах нужен CachePubSub поверх общего
+# кэша 'file' или 'redis', он опрашивает кэш раз в PUBSUB_POLL_INTERVAL с.
+PUBSUB_BACKEND = os.environ.get(
+    'YATUBE_PUBSUB_BACKEND', 'core.pubsub.LocalPubSub'
+)
+PUBSUB_POLL_INTERVAL = 0.5
+PUBSUB_MESSAGE_TIMEOUT = 60
+# Сколько непрочитанных событий держит одна подписка.
+PUBSUB_BUFFER = 100
+# Поток SSE о новых записях шлет комментарий-пинг раз в SSE_HEARTBEAT с,
+# чтобы прокси не закрыли соединение. Под WSGI поток держит рабочий
+# поток, поэтому обрывается через LONG_POLL_TIMEOUT с, и браузер
+# переподключается.
+SSE_HEARTBEAT = 15
+SSE_RETRY = 3000
+
+# Сколько секунд живет в кэше целая страница лент и записи. Ключ
+# меняется вместе с версиями областей страницы, так что срок нужен
+# только чтобы вытеснять старые ключи.
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# Отложенная запись комментариев и подписок (core.journal). При
+# YATUBE_WRITE_BEHIND=1 запрос только дописывает операцию в журнал
+# процесса, а фоновый поток раз в WRITE_BEHIND_INTERVAL с или каждые
+# WRITE_BEHIND_BATCH операций выполняет журнал одной транзакцией.
+# WRITE_BEHIND_FSYNC сбрасывает журнал на диск после каждой операции.
+WRITE_BEHIND = os.environ.get('YATUBE_WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_DIR = os.path.join(BASE_DIR, 'journal')
+WRITE_BEHIND_INTERVAL = 0.2
+WRITE_BEHIND_BATCH = 500
+WRITE_BEHIND_FSYNC = True
+# Сколько секунд автор видит свою еще не сброшенную операцию из кэша.
+WRITE_BEHIND_PENDING_TIMEOUT = 60 * 10
+# Сколько секунд хранятся id выполненных операций: повтор сегмента
+# возможен только сразу после падения процесса.
+WRITE_BEHIND_APPLIED_TIMEOUT = 60 * 60 * 24
+
+# Фоновые задачи (core.tasks) хранятся в базе и выполняются командой
+# run_tasks. Пока TASKS_RUN_IN_PROCESS включен, их после коммита сразу
+# берет и пул потоков веб-процесса; run_tasks тогда подбирает задачи,
+# которые не успели выполниться до перезапуска, и повторы.
+TASKS_RUN_IN_PROCESS = os.environ.get('YATUBE_TASKS_IN_PROCESS', '1') == '1'
+# Сколько задач каждой очереди выполняется одновременно.
+TASK_QUEUES = {
+    'default': 4,
+    'thumbnails': 2,
+    'mail': 1,
+}
+TASK_MAX_ATTEMPTS = 3
+# Пауза перед повтором, с; удваивается с каждой попыткой.
+TASK_RETRY_DELAY = 10
+# Задача, которая выполняется дольше, считается брошенной.
+TASK_LOCK_TIMEOUT = 60 * 10
+
+# Миниатюры готовятся в фоне; шаблоны не режут картинки внутри запроса.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+POST_THUMBNAIL_SIZES = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# Адаптивные варианты картинок для <picture>/srcset. Форматы, которые
+# не умеет сохранять установленный Pillow, пропускаются.
+POST_IMAGE_WIDTHS = (480, 768, 960)
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+POST_IMAGE_QUALITY = 80
+POST_IMAGE_SIZES_ATTR = '(max-width: 960px) 100vw, 960px'
 EMPTY_VALUE = '-пусто-'
@@ -13,6 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from core.views import metrics
 from django.conf import settings
 from django.conf.urls import handler403, handler404, handler500
 from django.conf.urls.static import static
@@ -30,6 +31,8 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('group_list/', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 if settings.DEBUG: